@@ -1,45 +1,51 @@
 import asyncio
-import base64
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from msgraph.generated.models.o_data_errors.o_data_error import ODataError
+import orjson
+import ormsgpack
 
 from app.config import settings
+from app.dependencies import get_graph_service, get_upload_progress_service
 from app.graph_service import GraphService
 from app.models import (
     UserResponse, InboxResponse, SendEmailRequest, SendEmailResponse,
     HealthResponse, TokenResponse, EmailMessage, EmailAddress,
     Recipient, ItemBody, FollowupFlag, Attachment,
-    ConversationsResponse, Conversation, FilterConversationsRequest,
+    ConversationsResponse, Conversation, MessageType, FilterConversationsRequest,
     FilterNudgingConversationsRequest, EmailTrackingResponse,
     UploadProgressResponse, InitUploadRequest, ChunkUploadRequest
 )
 from app.mongodb_service import mongodb_service
 from app.upload_progress_service import (
-    upload_progress_service,
+    UploadProgressService,
     UploadStatus
 )
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
-# Import the dependency function
-from app.dependencies import get_graph_service
+# Minimum gap after our own previous message for a follow-up to count as a nudge
+NUDGE_INTERVAL = timedelta(days=3)
+# How far back a conversation's last message may be for it to still need nudging
+NUDGE_WINDOW = timedelta(days=90)
 
 
 def _convert_graph_recipient(graph_recipient) -> Optional[Recipient]:
-    if not graph_recipient or not getattr(graph_recipient, "email_address", None):
+    if not graph_recipient or not graph_recipient.email_address:
         return None
 
     email_address = graph_recipient.email_address
-    return Recipient(
-        email_address=EmailAddress(
-            name=getattr(email_address, "name", None),
-            address=getattr(email_address, "address", None)
+    return Recipient.model_construct(
+        email_address=EmailAddress.model_construct(
+            name=email_address.name,
+            address=email_address.address
         )
     )
 
@@ -63,9 +69,9 @@ def _convert_graph_item_body(body) -> Optional[ItemBody]:
     if body is None:
         return None
 
-    return ItemBody(
-        content_type=getattr(body, "content_type", None),
-        content=getattr(body, "content", None)
+    return ItemBody.model_construct(
+        content_type=body.content_type,
+        content=body.content
     )
 
 
@@ -73,11 +79,11 @@ def _convert_graph_followup_flag(flag) -> Optional[FollowupFlag]:
     if flag is None:
         return None
 
-    return FollowupFlag(
-        status=getattr(flag, "flag_status", None) or getattr(flag, "status", None),
-        completed_date_time=getattr(flag, "completed_date_time", None),
-        due_date_time=getattr(flag, "due_date_time", None),
-        start_date_time=getattr(flag, "start_date_time", None)
+    return FollowupFlag.model_construct(
+        status=flag.flag_status,
+        completed_date_time=flag.completed_date_time,
+        due_date_time=flag.due_date_time,
+        start_date_time=flag.start_date_time
     )
 
 
@@ -85,32 +91,105 @@ def _convert_graph_attachments(attachments) -> Optional[List[Attachment]]:
     if not attachments:
         return None
 
-    converted: List[Attachment] = []
-    for attachment in attachments:
-        additional_data = getattr(attachment, "additional_data", {}) or {}
-        converted.append(
-            Attachment(
-                odata_type=getattr(attachment, "odata_type", None) or additional_data.get("@odata.type"),
-                id=getattr(attachment, "id", None),
-                name=getattr(attachment, "name", None),
-                content_type=getattr(attachment, "content_type", None),
-                size=getattr(attachment, "size", None),
-                is_inline=getattr(attachment, "is_inline", None),
-                last_modified_date_time=getattr(attachment, "last_modified_date_time", None)
-            )
+    converted = [
+        Attachment.model_construct(
+            odata_type=attachment.odata_type or (attachment.additional_data or {}).get("@odata.type"),
+            id=attachment.id,
+            name=attachment.name,
+            content_type=attachment.content_type,
+            size=attachment.size,
+            is_inline=attachment.is_inline,
+            last_modified_date_time=attachment.last_modified_date_time
         )
+        for attachment in attachments
+    ]
 
     return converted or None
 
 
+def _convert_graph_message(
+    message,
+    conversation_id: Optional[str] = None,
+    message_type: MessageType = MessageType.UNKNOWN,
+    is_from_current_user: bool = False
+) -> EmailMessage:
+    """
+    Convert a Graph SDK message to our response model
+
+    The SDK has already deserialized and typed the Graph payload, so the model is built
+    with model_construct to skip re-validating every message and nested field.
+    """
+    return EmailMessage.model_construct(
+        message_id=message.id,
+        subject=message.subject,
+        body=_convert_graph_item_body(message.body),
+        unique_body=_convert_graph_item_body(message.unique_body),
+        from_=_convert_graph_recipient(message.from_),
+        sender=_convert_graph_recipient(message.sender),
+        to_recipients=_convert_graph_recipient_list(message.to_recipients),
+        cc_recipients=_convert_graph_recipient_list(message.cc_recipients),
+        bcc_recipients=_convert_graph_recipient_list(message.bcc_recipients),
+        reply_to=_convert_graph_recipient_list(message.reply_to),
+        is_read=bool(message.is_read),
+        is_draft=message.is_draft,
+        is_delivery_receipt_requested=message.is_delivery_receipt_requested,
+        is_read_receipt_requested=message.is_read_receipt_requested,
+        has_attachments=message.has_attachments,
+        attachments=_convert_graph_attachments(message.attachments),
+        conversation_id=conversation_id or message.conversation_id,
+        importance=message.importance,
+        created_date_time=message.created_date_time,
+        last_modified_date_time=message.last_modified_date_time,
+        received_date_time=message.received_date_time,
+        sent_date_time=message.sent_date_time,
+        flag=_convert_graph_followup_flag(message.flag),
+        message_type=message_type,
+        is_from_current_user=is_from_current_user
+    )
+
+
+def _orjson_response(response_model) -> ORJSONResponse:
+    """Serialize an already-built response model directly, skipping FastAPI's re-validation"""
+    return ORJSONResponse(content=response_model.model_dump(mode="json", by_alias=True))
+
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+class MsgPackResponse(Response):
+    """MessagePack-encoded response for internal consumers that send Accept: application/x-msgpack"""
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content) -> bytes:
+        return ormsgpack.packb(content)
+
+
+def _wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for a MessagePack body instead of JSON"""
+    return MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+# Health timestamp memoized for one second; load balancers probe /health far more often than that
+_health_timestamp = {"expires_at": 0.0, "value": None}
+
+
+def _get_health_timestamp() -> datetime:
+    """Return the current time, refreshed at most once per second"""
+    now = time.monotonic()
+    if now >= _health_timestamp["expires_at"]:
+        _health_timestamp["value"] = datetime.now()
+        _health_timestamp["expires_at"] = now + 1.0
+    return _health_timestamp["value"]
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    return HealthResponse(
+    return HealthResponse.model_construct(
         status="healthy",
         app_name=settings.app_name,
         version=settings.app_version,
-        timestamp=datetime.now()
+        timestamp=_get_health_timestamp()
     )
 
 
@@ -120,7 +199,8 @@ async def _process_upload_async(
     file_content: bytes,
     filename: str,
     content_type: str,
-    graph_service: GraphService
+    graph_service: GraphService,
+    upload_progress_service: UploadProgressService
 ):
     """Process upload asynchronously: encode and upload to Graph API"""
     try:
@@ -163,24 +243,15 @@ async def _process_upload_async(
             )
         else:
             # Use regular attachment API for small files
-            upload_progress_service.update_progress(
-                upload_id,
-                status=UploadStatus.ENCODING
-            )
-            
-            # Convert to base64 for Graph API
-            content_base64 = base64.b64encode(file_content).decode('utf-8')
-            
-            # Update status: uploading
             upload_progress_service.update_progress(
                 upload_id,
                 status=UploadStatus.UPLOADING
             )
             
-            # Upload directly to draft
+            # Upload directly to draft; raw bytes are passed through, no base64 round trip needed
             attachments_data = [{
                 "name": filename,
-                "content": content_base64,
+                "content": file_content,
                 "content_type": content_type,
                 "size": actual_size
             }]
@@ -213,7 +284,8 @@ async def upload_attachment_to_draft(
         filename: Optional[str] = Form(None),
         size: Optional[int] = Form(None),
         content_type: Optional[str] = Form(None, alias="contentType"),
-        graph_service: GraphService = Depends(get_graph_service)
+        graph_service: GraphService = Depends(get_graph_service),
+        upload_progress_service: UploadProgressService = Depends(get_upload_progress_service)
 ):
     """
     Upload a file attachment directly to a draft message with progress tracking.
@@ -342,7 +414,8 @@ async def upload_attachment_to_draft(
             file_content=file_content,
             filename=filename,
             content_type=content_type,
-            graph_service=graph_service
+            graph_service=graph_service,
+            upload_progress_service=upload_progress_service
         ))
         
         # Return immediately with upload_id so client can start polling
@@ -376,7 +449,8 @@ async def upload_chunk_to_draft(
         end_byte: int = Form(...),
         total_size: int = Form(...),
         is_final: bool = Form(default=False),
-        graph_service: GraphService = Depends(get_graph_service)
+        graph_service: GraphService = Depends(get_graph_service),
+        upload_progress_service: UploadProgressService = Depends(get_upload_progress_service)
 ):
     """Upload a chunk of data to an existing upload session"""
     try:
@@ -448,7 +522,10 @@ async def upload_chunk_to_draft(
 
 
 @router.get("/uploads/{upload_id}/progress", response_model=UploadProgressResponse)
-async def get_upload_progress(upload_id: str):
+async def get_upload_progress(
+        upload_id: str,
+        upload_progress_service: UploadProgressService = Depends(get_upload_progress_service)
+):
     """Get upload progress for a specific upload"""
     progress = upload_progress_service.get_progress(upload_id)
     
@@ -458,7 +535,8 @@ async def get_upload_progress(upload_id: str):
             detail=f"Upload progress with ID {upload_id} not found"
         )
     
-    return UploadProgressResponse(**progress)
+    # get_progress already returns the UploadProgressResponse shape with JSON-ready values
+    return ORJSONResponse(content=progress)
 
 
 @router.get("/user", response_model=UserResponse)
@@ -466,210 +544,148 @@ async def get_user(
         graph_service: GraphService = Depends(get_graph_service)
 ):
     """Get authenticated user information"""
-    try:
-        user = await graph_service.get_user()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-
-        return UserResponse(
-            display_name=user.display_name,
-            email=user.mail,
-            user_principal_name=user.user_principal_name
-        )
-    except ODataError as e:
-        logger.error(f"Graph API error: {e}")
+    user = await graph_service.get_user()
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error getting user: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
         )
 
+    return UserResponse(
+        display_name=user.display_name,
+        email=user.mail,
+        user_principal_name=user.user_principal_name
+    )
+
+
+def _render_inbox_response(message_page) -> ORJSONResponse:
+    """Convert a Graph message page to a serialized InboxResponse"""
+    if not message_page or not message_page.value:
+        return _orjson_response(InboxResponse.model_construct(
+            messages=[],
+            total_count=0,
+            has_more=False
+        ))
+
+    # Convert messages to our response model
+    email_messages = [_convert_graph_message(message) for message in message_page.value]
+
+    return _orjson_response(InboxResponse.model_construct(
+        messages=email_messages,
+        total_count=len(email_messages),
+        has_more=message_page.odata_next_link is not None
+    ))
+
 
 @router.get("/emails/inbox", response_model=InboxResponse)
 async def get_inbox(
-        limit: int = 50,
+        limit: int = Query(default=50, ge=1, le=100),
+        include_body: bool = True,
         graph_service: GraphService = Depends(get_graph_service)
 ):
-    """Get inbox messages"""
-    try:
-        # Validate limit
-        if limit < 1 or limit > 100:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Limit must be between 1 and 100"
-            )
+    """
+    Get inbox messages
 
-        message_page = await graph_service.get_inbox(top=limit)
+    With include_body=false the message bodies are left out; fetch them on demand from
+    GET /emails/{message_id}/body.
+    """
+    message_page = await graph_service.get_inbox(top=limit, include_body=include_body)
 
-        if not message_page or not message_page.value:
-            return InboxResponse(
-                messages=[],
-                total_count=0,
-                has_more=False
-            )
+    # Conversion and serialization are pure CPU work, keep them off the event loop
+    return await asyncio.to_thread(_render_inbox_response, message_page)
 
-        # Convert messages to our response model
-        email_messages: List[EmailMessage] = []
-        for message in message_page.value:
-            email_message = EmailMessage(
-                message_id=getattr(message, "id", None),
-                subject=getattr(message, "subject", None),
-                body=_convert_graph_item_body(getattr(message, "body", None)),
-                unique_body=_convert_graph_item_body(getattr(message, "unique_body", None)),
-                from_=_convert_graph_recipient(getattr(message, "from_", None)),
-                sender=_convert_graph_recipient(getattr(message, "sender", None)),
-                to_recipients=_convert_graph_recipient_list(getattr(message, "to_recipients", None)),
-                cc_recipients=_convert_graph_recipient_list(getattr(message, "cc_recipients", None)),
-                bcc_recipients=_convert_graph_recipient_list(getattr(message, "bcc_recipients", None)),
-                reply_to=_convert_graph_recipient_list(getattr(message, "reply_to", None)),
-                is_read=bool(getattr(message, "is_read", False)),
-                is_draft=getattr(message, "is_draft", None),
-                is_delivery_receipt_requested=getattr(message, "is_delivery_receipt_requested", None),
-                is_read_receipt_requested=getattr(message, "is_read_receipt_requested", None),
-                has_attachments=getattr(message, "has_attachments", None),
-                attachments=_convert_graph_attachments(getattr(message, "attachments", None)),
-                conversation_id=getattr(message, "conversation_id", None),
-                importance=getattr(message, "importance", None),
-                created_date_time=getattr(message, "created_date_time", None),
-                last_modified_date_time=getattr(message, "last_modified_date_time", None),
-                received_date_time=getattr(message, "received_date_time", None),
-                sent_date_time=getattr(message, "sent_date_time", None),
-                flag=_convert_graph_followup_flag(getattr(message, "flag", None))
-            )
-            email_messages.append(email_message)
 
-        return InboxResponse(
-            messages=email_messages,
-            total_count=len(email_messages),
-            has_more=message_page.odata_next_link is not None
-        )
-
-    except ODataError as e:
-        logger.error(f"Graph API error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error getting inbox: {e}")
+@router.get("/emails/{message_id}/body", response_model=ItemBody)
+async def get_message_body(
+        message_id: str,
+        graph_service: GraphService = Depends(get_graph_service)
+):
+    """Get the body of a single message"""
+    body = await graph_service.get_message_body(message_id)
+    if not body:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message body not found"
         )
 
+    return _orjson_response(_convert_graph_item_body(body))
+
 
 @router.post("/emails/draft")
 async def create_empty_draft_email(
         graph_service: GraphService = Depends(get_graph_service)
 ):
     """Create an empty draft email and return its ID"""
-    try:
-        draft_id = await graph_service.create_empty_draft()
+    draft_id = await graph_service.create_empty_draft()
 
-        return {
-            "success": True,
-            "message": "Empty draft created successfully",
-            "draft_id": draft_id
-        }
+    return {
+        "success": True,
+        "message": "Empty draft created successfully",
+        "draft_id": draft_id
+    }
 
-    except ODataError as e:
-        logger.error(f"Graph API error creating draft: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error creating draft: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
+
+def _get_attachments_data(email_request: SendEmailRequest) -> List[Dict[str, str]]:
+    """Validate the request's base64 attachments and convert them to GraphService attachment dictionaries"""
+    attachments_data = []
+    for att in email_request.attachments or []:
+        if not att.content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="content is required for attachments"
+            )
+        if not att.name or not att.content_type:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="name and contentType are required for attachments"
+            )
+
+        attachments_data.append({
+            "name": att.name,
+            "content": att.content,
+            "content_type": att.content_type,
+            "size": att.size
+        })
+
+    return attachments_data
 
 
 @router.post("/emails/send/{draft_id}", response_model=SendEmailResponse)
 async def send_draft_email(
         draft_id: str,
         email_request: SendEmailRequest,
-        graph_service: GraphService = Depends(get_graph_service)
+        graph_service: GraphService = Depends(get_graph_service),
+        upload_progress_service: UploadProgressService = Depends(get_upload_progress_service)
 ):
     """Update draft with content and send it"""
-    try:
-        # Update the draft with content
-        await graph_service.update_draft(
-            draft_id=draft_id,
-            subject=email_request.subject,
-            body=email_request.body,
-            recipient=str(email_request.recipient),
-            body_type=email_request.body_type
-        )
-
-        # Wait for any pending file uploads to complete before sending
-        # This ensures attachments uploaded via upload session API are attached before sending
-        logger.info(f"Checking for pending uploads for draft {draft_id}")
-        uploads_completed = await upload_progress_service.wait_for_uploads(draft_id, timeout=300)
-        
-        if not uploads_completed:
-            pending = upload_progress_service.get_pending_uploads_for_draft(draft_id)
-            if pending:
-                raise HTTPException(
-                    status_code=status.HTTP_408_REQUEST_TIMEOUT,
-                    detail=f"File uploads are still in progress. Please wait for uploads to complete before sending."
-                )
+    attachments_data = _get_attachments_data(email_request)
 
-        # Add attachments if provided (base64 content)
-        if email_request.attachments:
-            attachments_data = []
-            for att in email_request.attachments:
-                if not att.content:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="content is required for attachments"
-                    )
-                if not att.name or not att.content_type:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="name and contentType are required for attachments"
-                    )
-                
-                attachments_data.append({
-                    "name": att.name,
-                    "content": att.content,
-                    "content_type": att.content_type,
-                    "size": att.size
-                })
-            
-            await graph_service.add_attachments_to_draft(draft_id, attachments_data)
+    # Attachments uploaded via upload session API must be attached before sending
+    logger.info(f"Checking for pending uploads for draft {draft_id}")
+    uploads_completed = await upload_progress_service.wait_for_uploads(draft_id, timeout=300)
 
-        # Send the draft
-        await graph_service.send_draft(draft_id)
+    if not uploads_completed:
+        pending = upload_progress_service.get_pending_uploads_for_draft(draft_id)
+        if pending:
+            raise HTTPException(
+                status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                detail=f"File uploads are still in progress. Please wait for uploads to complete before sending."
+            )
 
-        return SendEmailResponse(
-            success=True,
-            message=f"Email sent successfully to {email_request.recipient}"
-        )
+    # Update, attach (base64 content) and send in one batched round trip
+    await graph_service.update_and_send_draft(
+        draft_id=draft_id,
+        subject=email_request.subject,
+        body=email_request.body,
+        recipient=str(email_request.recipient),
+        body_type=email_request.body_type,
+        attachments=attachments_data
+    )
 
-    except ODataError as e:
-        logger.error(f"Graph API error sending draft: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error sending draft: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
+    return SendEmailResponse(
+        success=True,
+        message=f"Email sent successfully to {email_request.recipient}"
+    )
 
 
 @router.post("/emails/send", response_model=SendEmailResponse)
@@ -677,66 +693,19 @@ async def send_email(
         email_request: SendEmailRequest,
         graph_service: GraphService = Depends(get_graph_service)
 ):
-    """Send an email (convenience method that creates draft and sends immediately)"""
-    try:
-        # Create empty draft first
-        draft_id = await graph_service.create_empty_draft()
-        
-        # Update draft with content
-        await graph_service.update_draft(
-            draft_id=draft_id,
-            subject=email_request.subject,
-            body=email_request.body,
-            recipient=str(email_request.recipient),
-            body_type=email_request.body_type
-        )
-
-        # Add attachments if provided (base64 content)
-        if email_request.attachments:
-            attachments_data = []
-            for att in email_request.attachments:
-                if not att.content:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="content is required for attachments"
-                    )
-                if not att.name or not att.content_type:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="name and contentType are required for attachments"
-                    )
-                
-                attachments_data.append({
-                    "name": att.name,
-                    "content": att.content,
-                    "content_type": att.content_type,
-                    "size": att.size
-                })
-            
-            await graph_service.add_attachments_to_draft(draft_id, attachments_data)
-
-        # Then send it
-        await graph_service.send_draft(draft_id)
-
-        return SendEmailResponse(
-            success=True,
-            message=f"Email sent successfully to {email_request.recipient}"
-        )
+    """Send an email (convenience method that sends immediately, in a single Graph call unless the attachments are large)"""
+    await graph_service.send_mail(
+        subject=email_request.subject,
+        body=email_request.body,
+        recipient=str(email_request.recipient),
+        body_type=email_request.body_type,
+        attachments=_get_attachments_data(email_request)
+    )
 
-    except ODataError as e:
-        logger.error(f"Graph API error sending email: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error sending email: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
+    return SendEmailResponse(
+        success=True,
+        message=f"Email sent successfully to {email_request.recipient}"
+    )
 
 
 @router.get("/auth/token", response_model=TokenResponse)
@@ -744,195 +713,266 @@ async def get_token_info(
         graph_service: GraphService = Depends(get_graph_service)
 ):
     """Get token information"""
-    try:
-        token = await graph_service.get_user_token()
-        return TokenResponse(
-            has_valid_token=token is not None,
-            scopes=graph_service.graph_scopes
+    token = await graph_service.get_user_token()
+    return TokenResponse(
+        has_valid_token=token is not None,
+        scopes=graph_service.graph_scopes
+    )
+
+
+def _build_conversation(conversation_id: str, messages: List, current_user_email_lower: Optional[str]) -> Conversation:
+    """
+    Build a conversation response model, classifying each message by conversation flow
+
+    Args:
+        conversation_id: Conversation ID the messages belong to
+        messages: Graph SDK message objects in the conversation, already sorted chronologically by the grouping step
+        current_user_email_lower: Lower-cased email of the mailbox user, used to tell sent messages from replies
+
+    Returns:
+        Conversation with messages in chronological order
+    """
+    conversation_messages = []
+
+    # Track conversation flow for message type determination
+    first_user_message_found = False
+    last_message_status = MessageType.UNKNOWN
+    # Previous message's sender flag and normalized time, carried over so each message is resolved once
+    previous_is_from_user = False
+    previous_time = None
+
+    for message in messages:
+        # Normalize the message time for safe comparison
+        message_time = _normalize_datetime(message.received_date_time or message.sent_date_time)
+
+        # Determine if message is from current user
+        sender_address = message.from_.email_address if message.from_ else None
+        sender_email = sender_address.address if sender_address else None
+        is_from_current_user = bool(
+            current_user_email_lower and sender_email and sender_email.lower() == current_user_email_lower
         )
-    except Exception as e:
-        logger.error(f"Error getting token info: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+
+        # Determine message type based on conversation flow
+        message_type = MessageType.UNKNOWN
+        if is_from_current_user:
+            if not first_user_message_found:
+                message_type = MessageType.INITIAL
+                first_user_message_found = True
+            else:
+                # A nudge follows our own initial/follow_up message after at least NUDGE_INTERVAL
+                is_nudge = bool(
+                    previous_is_from_user
+                    and message_time
+                    and previous_time
+                    and message_time - previous_time >= NUDGE_INTERVAL
+                )
+
+                if is_nudge:
+                    message_type = MessageType.NUDGE
+                else:
+                    message_type = MessageType.FOLLOW_UP
+        else:
+            message_type = MessageType.REPLY
+
+        # Update last message status (this will be the final value after the loop)
+        last_message_status = message_type
+        previous_is_from_user = is_from_current_user
+        previous_time = message_time
+
+        conversation_message = _convert_graph_message(
+            message,
+            conversation_id=conversation_id,
+            message_type=message_type,
+            is_from_current_user=is_from_current_user
         )
+        conversation_messages.append(conversation_message)
 
+    return Conversation.model_construct(
+        conversation_id=conversation_id,
+        messages=conversation_messages,
+        total_messages=len(conversation_messages),
+        last_message_status=last_message_status
+    )
 
-@router.get("/conversations/{folder}", response_model=ConversationsResponse)
-async def get_conversations(
-        folder: str,
-        limit: int = 50,
-        graph_service: GraphService = Depends(get_graph_service)
-):
-    """Get conversations grouped by conversation ID from specified folder (inbox or sent)"""
-    try:
-        # Validate folder name
-        folder_lower = folder.lower()
-        if folder_lower not in ['inbox', 'sent', 'sentitems']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Folder must be 'inbox' or 'sent'"
-            )
-        
-        # Validate limit
-        if limit < 1 or limit > 100:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Limit must be between 1 and 100"
-            )
 
-        # Get current user context for reply detection
-        current_user = await graph_service.get_user()
-        current_user_email = None
-        if current_user:
-            current_user_email = current_user.mail or current_user.user_principal_name
+def _stream_conversations_ndjson(conversations_dict: Dict[str, List], current_user_email_lower: Optional[str]):
+    """Yield one NDJSON line per conversation, building each only when it is sent"""
+    for conversation_id, messages in conversations_dict.items():
+        conversation = _build_conversation(conversation_id, messages, current_user_email_lower)
+        yield orjson.dumps(conversation.model_dump(mode="json", by_alias=True)) + b"\n"
 
-        # Get messages from specified folder
-        message_page = await graph_service.get_messages_from_folder(folder_lower, top=limit)
-        
-        if not message_page or not message_page.value:
-            return ConversationsResponse(
-                conversations=[],
-                total_conversations=0,
-                total_messages=0
-            )
-        
-        # Group messages by conversation ID
-        conversations_dict = graph_service.group_messages_by_conversation_single_folder(message_page.value)
-
-        if not conversations_dict:
-            return ConversationsResponse(
-                conversations=[],
-                total_conversations=0,
-                total_messages=0
-            )
 
-        # Convert to response models
-        conversations = []
-        total_messages = 0
+def _conversations_response(conversations: List[Conversation], msgpack: bool = False) -> Response:
+    """Serialize conversations as a ConversationsResponse, totalling their messages"""
+    response_model = ConversationsResponse.model_construct(
+        conversations=conversations,
+        total_conversations=len(conversations),
+        total_messages=sum(conv.total_messages for conv in conversations)
+    )
+    if msgpack:
+        return MsgPackResponse(content=response_model.model_dump(mode="json", by_alias=True))
 
-        for conversation_id, messages in conversations_dict.items():
-            conversation_messages = []
+    return _orjson_response(response_model)
 
-            # Sort messages chronologically to determine message types
-            sorted_messages = sorted(
-                messages,
-                key=lambda msg: getattr(msg, "received_date_time", None)
-                or getattr(msg, "sent_date_time", None)
-                or ""
-            )
 
-            # Track conversation flow for message type determination
-            first_user_message_found = False
-            last_message_status = "unknown"
-
-            for i, message in enumerate(sorted_messages):
-                # Determine if message is from current user
-                is_from_current_user = False
-                if current_user_email and message.from_ and message.from_.email_address:
-                    sender_email = message.from_.email_address.address
-                    if sender_email and sender_email.lower() == current_user_email.lower():
-                        is_from_current_user = True
-
-                # Determine message type based on conversation flow
-                message_type = "unknown"
-                if is_from_current_user:
-                    if not first_user_message_found:
-                        message_type = "initial"
-                        first_user_message_found = True
-                    else:
-                        # Check if this is a nudge message
-                        is_nudge = False
-                        if i > 0:  # There's a previous message
-                            previous_message = sorted_messages[i - 1]
-                            previous_is_from_user = False
-                            if current_user_email and previous_message.from_ and previous_message.from_.email_address:
-                                prev_sender_email = previous_message.from_.email_address.address
-                                if prev_sender_email and prev_sender_email.lower() == current_user_email.lower():
-                                    previous_is_from_user = True
-
-                            # Check if previous message was initial or follow_up from current user
-                            if previous_is_from_user:
-                                # Check time elapsed between messages (3 days)
-                                current_time = message.received_date_time or message.sent_date_time
-                                previous_time = previous_message.received_date_time or previous_message.sent_date_time
-
-                                if current_time and previous_time:
-                                    # Normalize both datetimes for safe comparison
-                                    normalized_current_time = _normalize_datetime(current_time)
-                                    normalized_previous_time = _normalize_datetime(previous_time)
-
-                                    if normalized_current_time and normalized_previous_time:
-                                        time_diff = normalized_current_time - normalized_previous_time
-                                        if time_diff >= timedelta(days=3):
-                                            is_nudge = True
-
-                        if is_nudge:
-                            message_type = "nudge"
-                        else:
-                            message_type = "follow_up"
-                else:
-                    message_type = "reply"
-
-                # Update last message status (this will be the final value after the loop)
-                last_message_status = message_type
-
-                conversation_message = EmailMessage(
-                    message_id=getattr(message, "id", None),
-                    subject=getattr(message, "subject", None),
-                    body=_convert_graph_item_body(getattr(message, "body", None)),
-                    unique_body=_convert_graph_item_body(getattr(message, "unique_body", None)),
-                    from_=_convert_graph_recipient(getattr(message, "from_", None)),
-                    sender=_convert_graph_recipient(getattr(message, "sender", None)),
-                    to_recipients=_convert_graph_recipient_list(getattr(message, "to_recipients", None)),
-                    cc_recipients=_convert_graph_recipient_list(getattr(message, "cc_recipients", None)),
-                    bcc_recipients=_convert_graph_recipient_list(getattr(message, "bcc_recipients", None)),
-                    reply_to=_convert_graph_recipient_list(getattr(message, "reply_to", None)),
-                    is_read=bool(getattr(message, "is_read", False)),
-                    is_draft=getattr(message, "is_draft", None),
-                    is_delivery_receipt_requested=getattr(message, "is_delivery_receipt_requested", None),
-                    is_read_receipt_requested=getattr(message, "is_read_receipt_requested", None),
-                    has_attachments=getattr(message, "has_attachments", None),
-                    attachments=_convert_graph_attachments(getattr(message, "attachments", None)),
-                    conversation_id=conversation_id or getattr(message, "conversation_id", None),
-                    importance=getattr(message, "importance", None),
-                    created_date_time=getattr(message, "created_date_time", None),
-                    last_modified_date_time=getattr(message, "last_modified_date_time", None),
-                    received_date_time=getattr(message, "received_date_time", None),
-                    sent_date_time=getattr(message, "sent_date_time", None),
-                    flag=_convert_graph_followup_flag(getattr(message, "flag", None)),
-                    message_type=message_type,
-                    is_from_current_user=is_from_current_user
-                )
-                conversation_messages.append(conversation_message)
+def _render_conversations_response(
+        conversations_dict: Dict[str, List],
+        current_user_email_lower: Optional[str],
+        conversation_filter: Optional[Callable[[List[Conversation]], List[Conversation]]] = None
+) -> ORJSONResponse:
+    """
+    Build, optionally filter, and serialize conversations from grouped Graph messages
 
-            conversation = Conversation(
-                conversation_id=conversation_id,
-                messages=conversation_messages,
-                total_messages=len(conversation_messages),
-                last_message_status=last_message_status
-            )
-            conversations.append(conversation)
-            total_messages = len(conversation_messages)
+    Args:
+        conversations_dict: Conversation ID -> chronologically sorted Graph SDK messages
+        current_user_email_lower: Lower-cased email of the mailbox user
+        conversation_filter: Optional function selecting which built conversations to return
 
-        return ConversationsResponse(
-            conversations=conversations,
-            total_conversations=len(conversations),
-            total_messages=total_messages
-        )
+    Returns:
+        Serialized ConversationsResponse
+    """
+    conversations = [
+        _build_conversation(conversation_id, messages, current_user_email_lower)
+        for conversation_id, messages in conversations_dict.items()
+    ]
+    if conversation_filter is not None:
+        conversations = conversation_filter(conversations)
 
-    except ODataError as e:
-        logger.error(f"Graph API error getting conversations: {e}")
+    return _conversations_response(conversations)
+
+
+def _validate_conversations_folder(folder: str) -> str:
+    """Validate the folder for the conversations endpoints, returning the lower-cased folder"""
+    folder_lower = folder.lower()
+    if folder_lower not in ['inbox', 'sent', 'sentitems']:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Graph API error: {e.error.message if e.error else str(e)}"
+            detail="Folder must be 'inbox' or 'sent'"
         )
-    except Exception as e:
-        logger.error(f"Unexpected error getting conversations: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+
+    return folder_lower
+
+
+async def _get_folder_messages(
+        graph_service: GraphService,
+        folder_lower: str,
+        limit: int,
+        include_body: bool = True
+) -> Tuple[List, Optional[str]]:
+    """
+    Fetch folder messages together with the current user's email
+
+    Args:
+        graph_service: Graph service instance
+        folder_lower: Validated, lower-cased folder name
+        limit: Maximum number of messages to fetch
+        include_body: Whether to fetch message bodies
+
+    Returns:
+        Tuple of (Graph SDK messages, current user email)
+    """
+    # Get current user email (for reply detection) and folder messages in one batched round trip
+    current_user_email, message_page = await graph_service.get_current_email_and_messages_from_folder(
+        folder_lower,
+        top=limit,
+        include_body=include_body
+    )
+    messages = message_page.value if message_page and message_page.value else []
+    return messages, current_user_email
+
+
+def _group_conversations(
+        graph_service: GraphService,
+        messages: List,
+        current_user_email: Optional[str]
+) -> Tuple[Dict[str, List], Optional[str]]:
+    """
+    Group fetched folder messages by conversation
+
+    Args:
+        graph_service: Graph service instance
+        messages: Graph SDK messages from _get_folder_messages
+        current_user_email: Current user email from _get_folder_messages
+
+    Returns:
+        Tuple of (conversation ID -> chronologically sorted messages, lower-cased current user email)
+    """
+    # Lower-case once here rather than for every message comparison
+    current_user_email_lower = current_user_email.lower() if current_user_email else None
+
+    # Group messages by conversation ID
+    conversations_dict = {}
+    if messages:
+        conversations_dict = graph_service.group_messages_by_conversation_single_folder(messages)
+
+    return conversations_dict, current_user_email_lower
+
+
+async def _get_grouped_conversations(
+        graph_service: GraphService,
+        folder_lower: str,
+        limit: int,
+        include_body: bool = True
+) -> Tuple[Dict[str, List], Optional[str]]:
+    """
+    Fetch folder messages and group them by conversation
+
+    Args:
+        graph_service: Graph service instance
+        folder_lower: Validated, lower-cased folder name
+        limit: Maximum number of messages to fetch
+        include_body: Whether to fetch message bodies
+
+    Returns:
+        Tuple of (conversation ID -> chronologically sorted messages, lower-cased current user email)
+    """
+    messages, current_user_email = await _get_folder_messages(graph_service, folder_lower, limit, include_body)
+    return _group_conversations(graph_service, messages, current_user_email)
+
+
+@router.get("/conversations/{folder}", response_model=ConversationsResponse)
+async def get_conversations(
+        folder: str,
+        limit: int = Query(default=50, ge=1, le=100),
+        stream: bool = False,
+        include_body: bool = True,
+        graph_service: GraphService = Depends(get_graph_service)
+):
+    """
+    Get conversations grouped by conversation ID from specified folder (inbox or sent)
+
+    With stream=true the conversations are streamed as NDJSON (one conversation per line)
+    instead of a single ConversationsResponse document. With include_body=false the message
+    bodies are left out; fetch them on demand from GET /emails/{message_id}/body.
+    """
+    folder_lower = _validate_conversations_folder(folder)
+
+    if stream:
+        conversations_dict, current_user_email_lower = await _get_grouped_conversations(
+            graph_service,
+            folder_lower,
+            limit,
+            include_body
         )
+        return StreamingResponse(
+            _stream_conversations_ndjson(conversations_dict, current_user_email_lower),
+            media_type="application/x-ndjson"
+        )
+
+    messages, current_user_email = await _get_folder_messages(graph_service, folder_lower, limit, include_body)
+
+    # Skip grouping, classification and serialization while the fetched page is unchanged
+    fingerprint = graph_service.message_page_fingerprint(current_user_email, messages)
+    cached_body = graph_service.get_cached_conversations(folder_lower, limit, include_body, fingerprint)
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+
+    conversations_dict, current_user_email_lower = _group_conversations(graph_service, messages, current_user_email)
+    # Classification and serialization are pure CPU work, keep them off the event loop
+    response = await asyncio.to_thread(_render_conversations_response, conversations_dict, current_user_email_lower)
+
+    graph_service.set_cached_conversations(folder_lower, limit, include_body, fingerprint, response.body)
+    return response
 
 
 def _normalize_datetime(dt: datetime) -> datetime:
@@ -948,7 +988,10 @@ def _normalize_datetime(dt: datetime) -> datetime:
     if dt is None:
         return None
 
-    if dt.tzinfo is None:
+    if dt.tzinfo is timezone.utc:
+        # Already UTC (the Graph SDK parses 'Z' timestamps this way) - nothing to convert
+        return dt
+    elif dt.tzinfo is None:
         # Naive datetime - assume UTC
         return dt.replace(tzinfo=timezone.utc)
     else:
@@ -966,33 +1009,51 @@ def filter_conversations_needing_immediate_followup(conversations: List[Conversa
     Returns:
         List of conversations where last_message_status is 'reply'
     """
-    return [conv for conv in conversations if conv.last_message_status == "reply"]
+    return [conv for conv in conversations if conv.last_message_status == MessageType.REPLY]
 
 
 @router.post("/conversations/filter", response_model=ConversationsResponse)
 async def filter_conversations(
-        filter_request: FilterConversationsRequest
+        filter_request: FilterConversationsRequest,
+        request: Request
 ):
-    """Filter conversations needing immediate follow-up (last message status is 'reply')"""
-    try:
-        # Filter conversations that need follow-up
-        filtered_conversations = filter_conversations_needing_immediate_followup(filter_request.conversations)
+    """
+    Filter conversations needing immediate follow-up (last message status is 'reply')
 
-        # Calculate total messages in filtered conversations
-        total_messages = sum(conv.total_messages for conv in filtered_conversations)
+    Responds with MessagePack instead of JSON when the request sends Accept: application/x-msgpack.
+    """
+    # Filter conversations that need follow-up
+    filtered_conversations = filter_conversations_needing_immediate_followup(filter_request.conversations)
 
-        return ConversationsResponse(
-            conversations=filtered_conversations,
-            total_conversations=len(filtered_conversations),
-            total_messages=total_messages
-        )
+    return _conversations_response(filtered_conversations, msgpack=_wants_msgpack(request))
 
-    except Exception as e:
-        logger.error(f"Error filtering conversations: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
+
+@router.get("/conversations/{folder}/needs-followup", response_model=ConversationsResponse)
+async def get_conversations_needing_followup(
+        folder: str,
+        limit: int = Query(default=50, ge=1, le=100),
+        graph_service: GraphService = Depends(get_graph_service)
+):
+    """
+    Get conversations from the specified folder that need immediate follow-up (last message status is 'reply')
+
+    Server-side equivalent of POST /conversations/filter that does not require
+    uploading the conversations fetched from GET /conversations/{folder}.
+    """
+    folder_lower = _validate_conversations_folder(folder)
+    conversations_dict, current_user_email_lower = await _get_grouped_conversations(graph_service, folder_lower, limit)
+
+    # Classification and serialization are pure CPU work, keep them off the event loop
+    return await asyncio.to_thread(
+        _render_conversations_response,
+        conversations_dict,
+        current_user_email_lower,
+        filter_conversations_needing_immediate_followup
+    )
+
+
+# Statuses meaning the current user sent the last message in the conversation
+_NUDGE_CANDIDATE_STATUSES = frozenset({MessageType.INITIAL, MessageType.FOLLOW_UP, MessageType.NUDGE})
 
 
 def filter_conversations_needing_nudging(conversations: List[Conversation]) -> List[Conversation]:
@@ -1008,133 +1069,80 @@ def filter_conversations_needing_nudging(conversations: List[Conversation]) -> L
         and the last message is within the last 3 months
     """
     # Use timezone-aware datetime for comparison
-    three_months_ago = datetime.now(timezone.utc) - timedelta(days=90)
+    three_months_ago = datetime.now(timezone.utc) - NUDGE_WINDOW
 
     filtered_conversations = []
     for conv in conversations:
         # Check if last message status indicates user sent the last message
-        if conv.last_message_status in ["initial", "follow_up", "nudge"]:
+        if conv.last_message_status in _NUDGE_CANDIDATE_STATUSES:
             # Check if the last message is within the last 3 months
             if conv.messages:
                 last_message = conv.messages[-1]  # Messages are sorted chronologically
                 last_message_time = last_message.received_date_time
 
-                if last_message_time:
-                    # Normalize both datetimes for safe comparison
-                    normalized_last_message_time = _normalize_datetime(last_message_time)
-                    normalized_three_months_ago = _normalize_datetime(three_months_ago)
-
-                    if normalized_last_message_time and normalized_three_months_ago:
-                        if normalized_last_message_time >= normalized_three_months_ago:
-                            filtered_conversations.append(conv)
+                # Normalize for safe comparison; three_months_ago is already aware UTC
+                if last_message_time and _normalize_datetime(last_message_time) >= three_months_ago:
+                    filtered_conversations.append(conv)
 
     return filtered_conversations
 
 
 @router.post("/conversations/needing-nudging", response_model=ConversationsResponse)
 async def filter_conversations_needing_nudging_endpoint(
-        filter_request: FilterNudgingConversationsRequest
+        filter_request: FilterNudgingConversationsRequest,
+        request: Request
 ):
-    """Filter conversations that need nudging (last message from user, within 3 months)"""
-    try:
-        # Filter conversations that need nudging
-        filtered_conversations = filter_conversations_needing_nudging(filter_request.conversations)
-
-        # Calculate total messages in filtered conversations
-        total_messages = sum(conv.total_messages for conv in filtered_conversations)
+    """
+    Filter conversations that need nudging (last message from user, within 3 months)
 
-        return ConversationsResponse(
-            conversations=filtered_conversations,
-            total_conversations=len(filtered_conversations),
-            total_messages=total_messages
-        )
+    Responds with MessagePack instead of JSON when the request sends Accept: application/x-msgpack.
+    """
+    # Filter conversations that need nudging
+    filtered_conversations = filter_conversations_needing_nudging(filter_request.conversations)
 
-    except Exception as e:
-        logger.error(f"Error filtering conversations needing nudging: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
+    return _conversations_response(filtered_conversations, msgpack=_wants_msgpack(request))
 
 
 @router.get("/messages/{message_id}/tracking", response_model=EmailTrackingResponse)
 async def get_message_tracking(
-        message_id: str
+        message_id: str,
+        offset: int = Query(default=0, ge=0),
+        limit: Optional[int] = Query(default=None, ge=1, le=1000)
 ):
-    """Get email tracking data for a message ID (UUID)"""
-    try:
-        # Get tracking data from MongoDB
-        tracking_data = mongodb_service.get_tracking_data(message_id)
-        
-        if not tracking_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Tracking data for message ID {message_id} not found"
-            )
-        
-        # Convert MongoDB document to response model
-        # Handle views array - convert from MongoDB format
-        views = []
-        if "views" in tracking_data and tracking_data["views"]:
-            for view in tracking_data["views"]:
-                # Convert nested objects
-                browser = None
-                if view.get("browser"):
-                    browser = {
-                        "name": view["browser"].get("name"),
-                        "version": view["browser"].get("version")
-                    }
-                
-                device = None
-                if view.get("device"):
-                    device = {
-                        "type": view["device"].get("type"),
-                        "name": view["device"].get("name")
-                    }
-                
-                os = None
-                if view.get("os"):
-                    os = {
-                        "name": view["os"].get("name"),
-                        "version": view["os"].get("version")
-                    }
-                
-                location = None
-                if view.get("location"):
-                    location = {
-                        "country": view["location"].get("country"),
-                        "city": view["location"].get("city"),
-                        "latitude": view["location"].get("latitude"),
-                        "longitude": view["location"].get("longitude"),
-                        "isp": view["location"].get("isp"),
-                        "district": view["location"].get("district")
-                    }
-                
-                views.append({
-                    "timestamp": view.get("timestamp"),
-                    "ip": view.get("ip"),
-                    "userAgent": view.get("userAgent"),
-                    "referrer": view.get("referrer"),
-                    "browser": browser,
-                    "device": device,
-                    "os": os,
-                    "location": location
-                })
-        
-        response_data = {
-            "uuid": tracking_data.get("uuid"),
-            "createdAt": tracking_data.get("createdAt"),
-            "views": views,
-            "total_views": len(views)
-        }
-        
-        return EmailTrackingResponse(**response_data)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error getting tracking data for message {message_id}: {e}")
+    """
+    Get email tracking data for a message ID (UUID)
+
+    Without a limit every view is returned. With one, only views[offset:offset + limit] are
+    fetched from MongoDB, total_views counts the whole history, and the response echoes
+    offset and limit.
+    """
+    # Get tracking data from MongoDB; pymongo blocks, so the query runs in a worker thread
+    if limit is None:
+        tracking_data = await asyncio.to_thread(mongodb_service.get_tracking_data, message_id)
+    else:
+        tracking_data = await asyncio.to_thread(mongodb_service.get_tracking_data_page, message_id, offset, limit)
+    
+    if not tracking_data:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tracking data for message ID {message_id} not found"
         )
+    
+    # Documents come from our own tracking collection and their views are already shaped like
+    # EmailView, so serialize them straight to JSON without building models or copying views;
+    # OPT_UTC_Z keeps timestamps in the same "...Z" form pydantic emits
+    views = tracking_data["views"]
+    body = {
+        "uuid": tracking_data.get("uuid"),
+        "createdAt": tracking_data.get("createdAt"),
+        "views": views,
+        "total_views": tracking_data.get("total_views", len(views))
+    }
+    if limit is not None:
+        body["offset"] = offset
+        body["limit"] = limit
+
+    return Response(
+        content=orjson.dumps(body, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z),
+        media_type="application/json"
+    )
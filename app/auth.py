@@ -1,18 +1,22 @@
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
+import hmac
 import logging
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Encoded once so each request only encodes the presented credentials
+_API_KEY_BYTES = settings.api_key.encode()
+
 async def verify_api_key(credentials: HTTPAuthorizationCredentials = Security(security)) -> bool:
     """
     Verify the API key from the Authorization header
     In production, you should implement more sophisticated authentication
     """
-    if credentials.credentials != settings.api_key:
+    if not hmac.compare_digest(credentials.credentials.encode(), _API_KEY_BYTES):
         logger.warning(f"Invalid API key attempted: {credentials.credentials[:10]}...")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
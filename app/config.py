@@ -1,6 +1,7 @@
 import os
+from functools import lru_cache
 
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -20,13 +21,22 @@ class Settings(BaseSettings):
     mongodb_connection_string: str = os.getenv('MONGODB_CONNECTION_STRING', '')
     mongodb_database: str = os.getenv('MONGODB_DATABASE', 'powertrans_analytics')
     mongodb_collection: str = os.getenv('MONGODB_COLLECTION', 'email_viewers')
+    # Connections per worker; tracking lookups are short and cached, so pymongo's default of 100 is far too many
+    mongodb_max_pool_size: int = int(os.getenv('MONGODB_MAX_POOL_SIZE', '10'))
+    # Push tracking changes into the in-process cache with a change stream (needs a replica set, e.g. Atlas)
+    mongodb_watch_tracking: bool = os.getenv('MONGODB_WATCH_TRACKING', 'false').lower() == 'true'
 
     # API Security
     api_key: str = "your-secure-api-key-here"  # In production, use a strong key
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, parsing the environment only once"""
+    return Settings()
+
 
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from app.graph_service import GraphService
+from app.upload_progress_service import UploadProgressService
 
 # Global Graph service instance
 graph_service: GraphService = None
@@ -9,8 +10,22 @@ def set_graph_service(service: GraphService):
     global graph_service
     graph_service = service
 
-def get_graph_service() -> GraphService:
-    """Dependency to get the global graph service instance"""
+async def get_graph_service() -> GraphService:
+    """Dependency to get the global graph service instance (async so FastAPI skips the threadpool hop)"""
     if graph_service is None:
         raise HTTPException(status_code=500, detail="Graph service not initialized")
     return graph_service
+
+# Global upload progress service instance (created in the app's startup hook)
+upload_progress_service: UploadProgressService = None
+
+def set_upload_progress_service(service: UploadProgressService):
+    """Set the global upload progress service instance"""
+    global upload_progress_service
+    upload_progress_service = service
+
+async def get_upload_progress_service() -> UploadProgressService:
+    """Dependency to get the global upload progress service instance"""
+    if upload_progress_service is None:
+        raise HTTPException(status_code=500, detail="Upload progress service not initialized")
+    return upload_progress_service
@@ -1,25 +1,149 @@
 import asyncio
 import base64
+import binascii
+import hashlib
 import logging
+import time
 import httpx
-from typing import Optional, List, Dict, Callable
-
+import orjson
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional, List, Dict, Callable, Tuple, Union
+from urllib.parse import quote, urlencode
+
+from azure.core.credentials import AccessToken
 from azure.identity import ClientSecretCredential
 from kiota_abstractions.base_request_configuration import RequestConfiguration
-from msgraph import GraphServiceClient
+from kiota_authentication_azure.azure_identity_authentication_provider import AzureIdentityAuthenticationProvider
+from kiota_http.middleware.middleware import REQUEST_OPTIONS_KEY
+from kiota_http.middleware.options import RetryHandlerOption
+from kiota_abstractions.api_client_builder import register_default_deserializer
+from kiota_abstractions.serialization import ParseNode
+from kiota_serialization_json.json_parse_node import JsonParseNode
+from kiota_serialization_json.json_parse_node_factory import JsonParseNodeFactory
+from msgraph import GraphRequestAdapter, GraphServiceClient
 from msgraph.generated.models.body_type import BodyType
 from msgraph.generated.models.email_address import EmailAddress
 from msgraph.generated.models.file_attachment import FileAttachment
 from msgraph.generated.models.item_body import ItemBody
 from msgraph.generated.models.message import Message
+from msgraph.generated.models.message_collection_response import MessageCollectionResponse
 from msgraph.generated.models.o_data_errors.o_data_error import ODataError
 from msgraph.generated.models.recipient import Recipient
+from msgraph.generated.models.user import User
+from msgraph.generated.users.item.send_mail.send_mail_post_request_body import SendMailPostRequestBody
 from msgraph.generated.users.item.mail_folders.item.messages.messages_request_builder import (
     MessagesRequestBuilder)
+from msgraph.generated.users.item.messages.item.message_item_request_builder import MessageItemRequestBuilder
 from msgraph.generated.users.item.user_item_request_builder import UserItemRequestBuilder
+from msgraph_core import GraphClientFactory
 
 logger = logging.getLogger(__name__)
 
+GRAPH_USER_ID = 'sales@powertrans.vn'
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+TOKEN_REFRESH_MARGIN_SECONDS = 60  # Fetch a new app token this long before the cached one expires
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_BATCH_URL = f"{GRAPH_BASE_URL}/$batch"
+# Shared connection pool for all Graph traffic; timeouts match the Graph SDK defaults.
+# Idle connections are kept for 30s (httpx default: 5s) so requests a few seconds apart skip the TLS handshake
+GRAPH_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30.0)
+GRAPH_HTTP_TIMEOUT = httpx.Timeout(100.0, connect=30.0)
+# Requests made directly on http_client only pass through the SDK middleware (RetryHandler: Retry-After aware
+# backoff on 429/503/504) when they carry request options, as every SDK-built request does
+GRAPH_MIDDLEWARE_EXTENSIONS = {REQUEST_OPTIONS_KEY: {RetryHandlerOption.get_key(): RetryHandlerOption()}}
+GRAPH_BATCH_LIMIT = 20  # Maximum number of sub-requests per $batch call
+GRAPH_BATCH_RETRY_ATTEMPTS = 3  # Resends of throttled $batch sub-requests, matching the SDK's RetryHandler
+GRAPH_THROTTLED_STATUSES = frozenset({429, 503, 504})
+ATTACHMENT_UPLOAD_CONCURRENCY = 8  # Parallel attachment uploads per draft, well within the connection pool
+SIMPLE_ATTACHMENT_MAX_BYTES = 3 * 1024 * 1024  # Largest attachment Graph accepts in a single POST
+BATCH_ATTACHMENT_MAX_BYTES = 3 * 1024 * 1024  # Most decoded attachment bytes inlined into one $batch (Graph caps request bodies at 4MB)
+FOLDER_ID_MAP = {'inbox': 'inbox', 'sent': 'sentitems', 'sentitems': 'sentitems'}  # Folder names -> Graph well-known folder IDs
+MESSAGE_TIME_MIN = datetime.min.replace(tzinfo=timezone.utc)  # Sort key for messages without timestamps
+
+USER_SELECT = ('displayName', 'mail', 'userPrincipalName')
+USER_CACHE_TTL_SECONDS = 300  # The mailbox identity rarely changes, so /user is served from memory for 5 minutes
+MESSAGE_PAGE_CACHE_TTL_SECONDS = 15  # Polling clients get a fresh-enough inbox/sent page without a Graph round trip
+MESSAGE_PAGE_CACHE_MAX_ENTRIES = 64
+# Rendered /conversations/{folder} bodies are reused while the fetched page is unchanged
+CONVERSATIONS_CACHE_TTL_SECONDS = 60
+CONVERSATIONS_CACHE_MAX_ENTRIES = 2048
+# Fields needed by the inbox listing and conversation grouping (internetMessageId is the grouping fallback)
+LIST_MESSAGE_SELECT = ('id', 'from', 'isRead', 'receivedDateTime', 'sentDateTime', 'subject', 'conversationId',
+                       'internetMessageId')
+FOLDER_MESSAGE_SELECT = ('from', 'isRead', 'receivedDateTime', 'subject', 'conversationId', 'internetMessageId',
+                         'id', 'sender', 'toRecipients', 'ccRecipients', 'bccRecipients', 'replyTo',
+                         'isDraft', 'isDeliveryReceiptRequested', 'isReadReceiptRequested', 'hasAttachments',
+                         'attachments', 'importance', 'createdDateTime', 'lastModifiedDateTime', 'sentDateTime', 'flag')
+# Bodies dwarf every other field, so listings only select them when the caller renders them
+LIST_MESSAGE_BODY_SELECT = LIST_MESSAGE_SELECT + ('body',)
+FOLDER_MESSAGE_BODY_SELECT = FOLDER_MESSAGE_SELECT + ('body', 'uniqueBody')
+MESSAGE_BODY_SELECT = ('body',)
+
+IMMUTABLE_ID_PREFER = 'IdType="ImmutableId"'
+# Request configurations are only read when a request is built, so one instance can be shared by all calls
+IMMUTABLE_ID_REQUEST_CONFIG = RequestConfiguration()
+IMMUTABLE_ID_REQUEST_CONFIG.headers.add("Prefer", IMMUTABLE_ID_PREFER)
+USER_REQUEST_CONFIG = UserItemRequestBuilder.UserItemRequestBuilderGetRequestConfiguration(
+    query_parameters=UserItemRequestBuilder.UserItemRequestBuilderGetQueryParameters(select=list(USER_SELECT))
+)
+MESSAGE_BODY_REQUEST_CONFIG = MessageItemRequestBuilder.MessageItemRequestBuilderGetRequestConfiguration(
+    query_parameters=MessageItemRequestBuilder.MessageItemRequestBuilderGetQueryParameters(select=list(MESSAGE_BODY_SELECT))
+)
+
+
+@lru_cache(maxsize=256)
+def _messages_request_config(
+        select: Tuple[str, ...],
+        top: int,
+        orderby: str,
+        immutable_id: bool
+) -> MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration:
+    """Build (once per distinct argument set) the request configuration for a folder messages GET"""
+    request_config = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
+        query_parameters=MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
+            select=list(select),
+            top=top,
+            orderby=[orderby]
+        )
+    )
+    if immutable_id:
+        # Use ImmutableId preference when retrieving
+        request_config.headers.add("Prefer", IMMUTABLE_ID_PREFER)
+    return request_config
+
+
+class OrjsonParseNodeFactory(JsonParseNodeFactory):
+    """JSON parse node factory that decodes response bodies with orjson instead of the stdlib json module"""
+
+    def get_root_parse_node(self, content_type: str, content: bytes) -> ParseNode:
+        if not content_type:
+            raise TypeError("Content Type cannot be null")
+        if self.get_valid_content_type().casefold() != content_type.casefold():
+            raise TypeError(f"Expected {self.get_valid_content_type()} as content type")
+        if not content:
+            raise TypeError("Content cannot be null")
+
+        return JsonParseNode(orjson.loads(content))
+
+
+class BytesViewStream:
+    """
+    Request body that hands a bytes-like object (e.g. a memoryview slice) to httpx as is
+
+    Sending a view avoids copying the chunk out of the file bytes. Unlike an async generator it
+    can be iterated again, so the body can be resent if the request is retried.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
 
 class GraphService:
     """Enhanced Graph service for API usage"""
@@ -30,132 +154,586 @@ class GraphService:
         self.client_secret = client_secret
 
         self.client_credential = ClientSecretCredential(tenant_id, client_id, client_secret)
+        self.graph_scopes = [GRAPH_SCOPE]
+        # App token for the direct HTTP calls ($batch, upload sessions), see _get_access_token()
+        self._cached_token: Optional[AccessToken] = None
+        self._token_lock = asyncio.Lock()
+
+        # One pooled HTTP client shared by the Graph SDK and the direct HTTP calls below,
+        # so keep-alive connections (and their TLS sessions) are reused across requests.
+        # HTTP/2 multiplexes concurrent requests over one connection; with the brotli extra
+        # installed httpx also advertises (and decodes) br next to gzip for the JSON bodies
+        self.http_client = GraphClientFactory.create_with_default_middleware(
+            client=httpx.AsyncClient(
+                base_url=GRAPH_BASE_URL,
+                limits=GRAPH_HTTP_LIMITS,
+                timeout=GRAPH_HTTP_TIMEOUT,
+                http2=True
+            )
+        )
+        auth_provider = AzureIdentityAuthenticationProvider(self.client_credential, scopes=[GRAPH_SCOPE])
 
         self.user_client = GraphServiceClient(
-            self.client_credential,
+            request_adapter=GraphRequestAdapter(auth_provider, client=self.http_client)
         )
+        # GraphServiceClient registers the stdlib-json factory for application/json; replace it afterwards
+        register_default_deserializer(OrjsonParseNodeFactory)
+        # Request builders are immutable, so the mailbox and well-known folder builders are built once
+        self.mailbox = self.user_client.users.by_user_id(GRAPH_USER_ID)
+        self._folder_messages_builders = {
+            folder_id: self.mailbox.mail_folders.by_mail_folder_id(folder_id).messages
+            for folder_id in ('inbox', 'sentitems')
+        }
+
+        # Short-lived cache of the mailbox user, see get_user()
+        self._cached_user: Optional[User] = None
+        self._cached_email: Optional[str] = None
+        self._cached_user_expires_at = 0.0
+
+        # Short-lived cache of inbox/sent message pages keyed by (folder ID, top), see get_inbox()/get_sent()
+        self._message_page_cache: Dict[Tuple[str, int, bool], Tuple[float, MessageCollectionResponse]] = {}
+        # Fetch lock and number of requests holding or waiting for it, per page; see _message_page_lock()
+        self._message_page_locks: Dict[Tuple[str, int, bool], List] = {}
+        # Rendered conversations keyed by (folder ID, top, include_body), see get_cached_conversations()
+        self._conversations_cache: Dict[Tuple[str, int, bool], Tuple[float, Tuple, bytes]] = {}
+
+    async def close(self):
+        """Close the shared HTTP connection pool and the credential's token-endpoint session"""
+        await self.http_client.aclose()
+        self.client_credential.close()
 
     async def get_user_token(self) -> Optional[str]:
         """Get user access token"""
         try:
-            access_token = self.device_code_credential.get_token(' '.join(self.graph_scopes))
-            return access_token.token
+            return await self._get_access_token()
         except Exception as e:
             logger.error(f"Error getting user token: {e}")
             return None
 
-    async def get_user(self):
-        """Get current user information"""
-        try:
-            query_params = UserItemRequestBuilder.UserItemRequestBuilderGetQueryParameters(
-                select=['displayName', 'mail', 'userPrincipalName']
-            )
+    async def _get_access_token(self) -> str:
+        """
+        Get an app access token for Graph, reusing the cached one until it is about to expire
 
-            request_config = UserItemRequestBuilder.UserItemRequestBuilderGetRequestConfiguration(
-                query_parameters=query_params
-            )
+        ClientSecretCredential.get_token is synchronous and may hit the network, so a refresh
+        runs in a worker thread instead of blocking the event loop. Concurrent callers wait for
+        a single refresh instead of each starting their own.
 
-            user = await self.user_client.users.by_user_id('sales@powertrans.vn').get(request_configuration=request_config)
+        Returns:
+            Bearer token string
+        """
+        cached_token = self._cached_token
+        if cached_token is not None and cached_token.expires_on - time.time() > TOKEN_REFRESH_MARGIN_SECONDS:
+            return cached_token.token
+
+        async with self._token_lock:
+            # Another caller may have refreshed the token while we waited for the lock
+            cached_token = self._cached_token
+            if cached_token is None or cached_token.expires_on - time.time() <= TOKEN_REFRESH_MARGIN_SECONDS:
+                cached_token = await asyncio.to_thread(self.client_credential.get_token, GRAPH_SCOPE)
+                self._cached_token = cached_token
+            return cached_token.token
+
+    async def get_user(self):
+        """Get current user information (cached for USER_CACHE_TTL_SECONDS)"""
+        cached_user = self._get_cached_user()
+        if cached_user is not None:
+            return cached_user
+
+        try:
+            user = await self.mailbox.get(request_configuration=USER_REQUEST_CONFIG)
+            self._set_cached_user(user)
             return user
         except ODataError as e:
             logger.error(f"OData error getting user: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting user: {e}")
+            self._invalidate_cached_user_on_auth_error(e)
             raise
 
-    async def get_inbox(self, top: int = 50):
-        """Get inbox messages"""
+    async def get_inbox(self, top: int = 50, include_body: bool = True):
+        """Get inbox messages (cached for MESSAGE_PAGE_CACHE_TTL_SECONDS), leaving out bodies unless include_body is set"""
+        cached_page = self._get_cached_message_page('inbox', top, include_body)
+        if cached_page is not None:
+            return cached_page
+
+        # Concurrent misses for the same page wait for the first fetch instead of each calling Graph
+        async with self._message_page_lock(('inbox', top, include_body)):
+            cached_page = self._get_cached_message_page('inbox', top, include_body)
+            if cached_page is not None:
+                return cached_page
+
+            try:
+                select = LIST_MESSAGE_BODY_SELECT if include_body else LIST_MESSAGE_SELECT
+                request_config = _messages_request_config(select, top, 'receivedDateTime DESC', False)
+
+                messages = await self._folder_messages_builder('inbox').get(
+                    request_configuration=request_config)
+                self._set_cached_message_page('inbox', top, include_body, messages)
+                return messages
+            except ODataError as e:
+                logger.error(f"OData error getting inbox: {e}")
+                raise
+
+    async def get_sent(self, top: int = 50, include_body: bool = True):
+        """Get sent messages (cached for MESSAGE_PAGE_CACHE_TTL_SECONDS), leaving out bodies unless include_body is set"""
+        cached_page = self._get_cached_message_page('sentitems', top, include_body)
+        if cached_page is not None:
+            return cached_page
+
+        # Concurrent misses for the same page wait for the first fetch instead of each calling Graph
+        async with self._message_page_lock(('sentitems', top, include_body)):
+            cached_page = self._get_cached_message_page('sentitems', top, include_body)
+            if cached_page is not None:
+                return cached_page
+
+            try:
+                select = LIST_MESSAGE_BODY_SELECT if include_body else LIST_MESSAGE_SELECT
+                request_config = _messages_request_config(select, top, 'sentDateTime DESC', True)
+
+                messages = await self._folder_messages_builder('sentitems').get(
+                    request_configuration=request_config)
+                self._set_cached_message_page('sentitems', top, include_body, messages)
+                return messages
+            except ODataError as e:
+                logger.error(f"OData error getting sent messages: {e}")
+                raise
+
+    async def get_messages_from_folder(self, folder_name: str, top: int = 50, include_body: bool = True):
+        """
+        Get messages from a specific folder by folder name
+        
+        Args:
+            folder_name: Name of the folder ('inbox' or 'sent')
+            top: Maximum number of messages to fetch
+            include_body: Whether to select body and uniqueBody (see get_message_body for on-demand bodies)
+            
+        Returns:
+            Messages response from Microsoft Graph
+        """
         try:
-            query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
-                select=['from', 'isRead', 'receivedDateTime', 'subject', 'body', 'conversationId', 'internetMessageId'],
-                top=top,
-                orderby=['receivedDateTime DESC']
-            )
-            request_config = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
-                query_parameters=query_params
-            )
+            folder_id = self._resolve_folder_id(folder_name)
+
+            select = FOLDER_MESSAGE_BODY_SELECT if include_body else FOLDER_MESSAGE_SELECT
+            request_config = _messages_request_config(select, top, self._folder_orderby(folder_id), True)
 
-            messages = await self.user_client.users.by_user_id('sales@powertrans.vn').mail_folders.by_mail_folder_id('inbox').messages.get(
+            messages = await self._folder_messages_builder(folder_id).get(
                 request_configuration=request_config)
             return messages
         except ODataError as e:
-            logger.error(f"OData error getting inbox: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting inbox: {e}")
+            logger.error(f"OData error getting messages from folder {folder_name}: {e}")
             raise
 
-    async def get_sent(self, top: int = 50):
-        """Get sent messages"""
-        try:
-            query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
-                select=['from', 'isRead', 'receivedDateTime', 'subject', 'body', 'conversationId', 'internetMessageId', 'id'],
-                top=top,
-                orderby=['sentDateTime DESC']
-            )
-            request_config = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
-                query_parameters=query_params
-            )
-            # Use ImmutableId preference when retrieving
-            request_config.headers = RequestConfiguration().headers
-            request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
+    async def get_message_body(self, message_id: str) -> Optional[ItemBody]:
+        """
+        Get the body of a single message, for callers that listed messages without bodies
 
-            messages = await self.user_client.users.by_user_id('sales@powertrans.vn').mail_folders.by_mail_folder_id('sentitems').messages.get(
-                request_configuration=request_config)
-            return messages
+        Args:
+            message_id: ID of the message
+
+        Returns:
+            The message body from Microsoft Graph, or None if the message has none
+        """
+        try:
+            message = await self.mailbox.messages.by_message_id(message_id).get(
+                request_configuration=MESSAGE_BODY_REQUEST_CONFIG)
+            return message.body if message else None
         except ODataError as e:
-            logger.error(f"OData error getting sent messages: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting sent messages: {e}")
+            logger.error(f"OData error getting body of message {message_id}: {e}")
             raise
 
-    async def get_messages_from_folder(self, folder_name: str, top: int = 50):
+    async def get_current_email(self) -> Optional[str]:
+        """Get the current user's email address (mail, falling back to userPrincipalName)"""
+        if self._get_cached_user() is None:
+            await self.get_user()
+        return self._cached_email
+
+    async def get_current_email_and_messages_from_folder(
+            self,
+            folder_name: str,
+            top: int = 50,
+            include_body: bool = True
+    ) -> Tuple[Optional[str], Optional[MessageCollectionResponse]]:
         """
-        Get messages from a specific folder by folder name
-        
+        Get the current user's email and messages from a folder in a single Graph $batch round trip
+
+        The user sub-request is skipped while the cached user is still fresh.
+
         Args:
             folder_name: Name of the folder ('inbox' or 'sent')
             top: Maximum number of messages to fetch
-            
+            include_body: Whether to select body and uniqueBody (see get_message_body for on-demand bodies)
+
         Returns:
-            Messages response from Microsoft Graph
+            Tuple of (current user email, messages response) from Microsoft Graph
         """
         try:
-            # Map folder names to folder IDs
-            folder_id_map = {
-                'inbox': 'inbox',
-                'sent': 'sentitems',
-                'sentitems': 'sentitems'
-            }
-            
-            folder_id = folder_id_map.get(folder_name.lower(), folder_name.lower())
-            
-            query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
-                select=['from', 'isRead', 'receivedDateTime', 'subject', 'body', 'conversationId', 'internetMessageId', 
-                        'id', 'uniqueBody', 'sender', 'toRecipients', 'ccRecipients', 'bccRecipients', 'replyTo',
-                        'isDraft', 'isDeliveryReceiptRequested', 'isReadReceiptRequested', 'hasAttachments',
-                        'attachments', 'importance', 'createdDateTime', 'lastModifiedDateTime', 'sentDateTime', 'flag'],
-                top=top,
-                orderby=['sentDateTime DESC' if folder_id == 'sentitems' else 'receivedDateTime DESC']
+            folder_id = self._resolve_folder_id(folder_name)
+
+            sub_requests = [
+                {
+                    "id": "messages",
+                    "method": "GET",
+                    "url": self._folder_messages_url(
+                        folder_id,
+                        FOLDER_MESSAGE_BODY_SELECT if include_body else FOLDER_MESSAGE_SELECT,
+                        top
+                    ),
+                    "headers": {"Prefer": IMMUTABLE_ID_PREFER}
+                }
+            ]
+
+            # Only ask Graph for the user when it is not already cached
+            user = self._get_cached_user()
+            if user is None:
+                sub_requests.append({
+                    "id": "user",
+                    "method": "GET",
+                    "url": f"/users/{GRAPH_USER_ID}?$select={','.join(USER_SELECT)}"
+                })
+
+            responses = await self._batch(sub_requests)
+
+            if user is None:
+                self._set_cached_user(self._parse_batch_response(responses["user"], User))
+            messages = self._parse_batch_response(responses["messages"], MessageCollectionResponse)
+            return self._cached_email, messages
+        except ODataError as e:
+            logger.error(f"OData error getting user and messages from folder {folder_name}: {e}")
+            self._invalidate_cached_user_on_auth_error(e)
+            raise
+
+    async def _batch(self, requests: List[Dict]) -> Dict[str, Dict]:
+        """
+        Send sub-requests through the Graph JSON batching endpoint
+
+        Args:
+            requests: List of sub-request dictionaries with 'id', 'method', 'url' (relative to /v1.0)
+                and optional 'headers'/'body'. More than 20 sub-requests are split into several batches.
+
+        Sub-requests throttled by Graph (429/503/504 inside a successful batch, which the HTTP retry
+        middleware never sees) are resent after their Retry-After delay, together with the
+        sub-requests that only failed because they depend on a throttled one.
+
+        Returns:
+            Dictionary mapping each sub-request ID to its response ('id', 'status', 'headers', 'body')
+        """
+        responses = await self._post_batch(requests)
+
+        for attempt in range(GRAPH_BATCH_RETRY_ATTEMPTS):
+            retry_ids = self._throttled_batch_request_ids(requests, responses)
+            if not retry_ids:
+                break
+
+            retry_after = max(
+                self._retry_after_seconds(responses[request_id].get("headers"), 2 ** attempt)
+                for request_id in retry_ids
+                if responses[request_id].get("status") in GRAPH_THROTTLED_STATUSES
             )
-            request_config = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
-                query_parameters=query_params
+            logger.warning(f"{len(retry_ids)} batch sub-request(s) throttled, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+            retry_requests = []
+            for request in requests:
+                if request["id"] not in retry_ids:
+                    continue
+                request = dict(request)
+                # Dependencies that already succeeded are not resent, so they must not be referenced
+                depends_on = [request_id for request_id in request.pop("dependsOn", []) if request_id in retry_ids]
+                if depends_on:
+                    request["dependsOn"] = depends_on
+                retry_requests.append(request)
+
+            responses.update(await self._post_batch(retry_requests))
+
+        return responses
+
+    @staticmethod
+    def _retry_after_seconds(headers: Optional[Dict], default: float) -> float:
+        """
+        Seconds to wait from a Retry-After header, which is either a delay or an HTTP-date
+
+        Falls back to default when the header is missing or cannot be parsed.
+        """
+        retry_after = (headers or {}).get("Retry-After")
+        if retry_after is None:
+            return default
+        try:
+            return max(float(retry_after), 0.0)
+        except (TypeError, ValueError):
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            # RFC 9110 dates are always GMT
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    @staticmethod
+    def _throttled_batch_request_ids(requests: List[Dict], responses: Dict[str, Dict]) -> set:
+        """
+        IDs of throttled sub-requests plus those that failed with 424 only because of them
+
+        A 424 (Failed Dependency) request is retried only when every failed dependency is retried
+        too, so a request never runs after a dependency that failed for good.
+        """
+        retry_ids = {
+            request_id for request_id, response in responses.items()
+            if response.get("status") in GRAPH_THROTTLED_STATUSES
+        }
+        if not retry_ids:
+            return retry_ids
+
+        added = True
+        while added:
+            added = False
+            for request in requests:
+                request_id = request["id"]
+                if request_id in retry_ids or responses[request_id].get("status") != 424:
+                    continue
+                failed_dependencies = [
+                    dependency for dependency in request.get("dependsOn", [])
+                    if responses[dependency].get("status", 500) >= 400
+                ]
+                if failed_dependencies and all(dependency in retry_ids for dependency in failed_dependencies):
+                    retry_ids.add(request_id)
+                    added = True
+
+        return retry_ids
+
+    async def _post_batch(self, requests: List[Dict]) -> Dict[str, Dict]:
+        """POST sub-requests to the $batch endpoint, GRAPH_BATCH_LIMIT per call, concurrently"""
+        token = await self._get_access_token()
+        chunks = [requests[i:i + GRAPH_BATCH_LIMIT] for i in range(0, len(requests), GRAPH_BATCH_LIMIT)]
+
+        async def post_chunk(chunk: List[Dict]) -> List[Dict]:
+            response = await self.http_client.post(
+                GRAPH_BATCH_URL,
+                content=orjson.dumps({"requests": chunk}),
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30.0,
+                extensions=GRAPH_MIDDLEWARE_EXTENSIONS
             )
-            # Use ImmutableId preference when retrieving
-            request_config.headers = RequestConfiguration().headers
-            request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
 
-            messages = await self.user_client.users.by_user_id('sales@powertrans.vn').mail_folders.by_mail_folder_id(folder_id).messages.get(
-                request_configuration=request_config)
-            return messages
-        except ODataError as e:
-            logger.error(f"OData error getting messages from folder {folder_name}: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting messages from folder {folder_name}: {e}")
-            raise
+            if response.status_code != 200:
+                error_msg = f"Batch request failed: {response.status_code} - {response.text}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+            return orjson.loads(response.content).get("responses", [])
+
+        results = await asyncio.gather(*(post_chunk(chunk) for chunk in chunks))
+
+        return {response["id"]: response for chunk_responses in results for response in chunk_responses}
+
+    @staticmethod
+    def _parse_batch_response(response: Dict, factory):
+        """
+        Deserialize a $batch sub-response body into a Graph SDK model
+
+        Args:
+            response: Sub-response dictionary returned by _batch
+            factory: Graph SDK model class to deserialize the body into
+
+        Returns:
+            Deserialized model instance
+
+        Raises:
+            ODataError: If the sub-request failed
+        """
+        GraphService._raise_for_batch_error(response)
+
+        return JsonParseNode(response.get("body") or {}).get_object_value(factory)
+
+    @staticmethod
+    def _raise_for_batch_error(response: Dict):
+        """
+        Raise the ODataError carried by a failed $batch sub-response
+
+        Args:
+            response: Sub-response dictionary returned by _batch
+
+        Raises:
+            ODataError: If the sub-request failed
+        """
+        status_code = response.get("status", 500)
+        if status_code >= 400:
+            error = JsonParseNode(response.get("body") or {}).get_object_value(ODataError)
+            error.response_status_code = status_code
+            raise error
+
+    def _get_cached_user(self) -> Optional[User]:
+        """Return the cached user if it has not expired yet"""
+        if self._cached_user is not None and time.monotonic() < self._cached_user_expires_at:
+            return self._cached_user
+        return None
+
+    def _set_cached_user(self, user: Optional[User]):
+        """Cache the user for USER_CACHE_TTL_SECONDS"""
+        if user is None:
+            return
+        self._cached_user = user
+        self._cached_email = user.mail or user.user_principal_name
+        self._cached_user_expires_at = time.monotonic() + USER_CACHE_TTL_SECONDS
+
+    def _invalidate_cached_user_on_auth_error(self, error: ODataError):
+        """Drop the cached user when Graph rejects our credentials"""
+        if error.response_status_code == 401:
+            self._cached_user = None
+            self._cached_email = None
+            self._cached_user_expires_at = 0.0
+
+    def _get_cached_message_page(
+            self,
+            folder_id: str,
+            top: int,
+            include_body: bool
+    ) -> Optional[MessageCollectionResponse]:
+        """Return the cached message page for a folder if it has not expired yet"""
+        # A page fetched with bodies also answers a request that does not need them
+        for key in ((folder_id, top, include_body), (folder_id, top, True)):
+            cached = self._message_page_cache.get(key)
+            if cached is not None and time.monotonic() < cached[0]:
+                return cached[1]
+        return None
+
+    @asynccontextmanager
+    async def _message_page_lock(self, key: Tuple[str, int, bool]):
+        """Hold a page's fetch lock, dropping it once no request holds or waits for it"""
+        entry = self._message_page_locks.get(key)
+        if entry is None:
+            entry = self._message_page_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            # Every caller runs on the event loop, so the count needs no further locking
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._message_page_locks[key]
+
+    def _set_cached_message_page(
+            self,
+            folder_id: str,
+            top: int,
+            include_body: bool,
+            page: Optional[MessageCollectionResponse]
+    ):
+        """Cache a folder's message page for MESSAGE_PAGE_CACHE_TTL_SECONDS, keeping at most MESSAGE_PAGE_CACHE_MAX_ENTRIES pages"""
+        if page is None:
+            return
+        key = (folder_id, top, include_body)
+        # Re-insert so the dict order is least-recently-stored first, then evict from the front
+        self._message_page_cache.pop(key, None)
+        while len(self._message_page_cache) >= MESSAGE_PAGE_CACHE_MAX_ENTRIES:
+            del self._message_page_cache[next(iter(self._message_page_cache))]
+        self._message_page_cache[key] = (time.monotonic() + MESSAGE_PAGE_CACHE_TTL_SECONDS, page)
+
+    def _invalidate_cached_message_pages(self, folder_id: str):
+        """Drop every cached page of a folder and the conversations rendered from it"""
+        for key in [key for key in self._message_page_cache if key[0] == folder_id]:
+            del self._message_page_cache[key]
+        for key in [key for key in self._conversations_cache if key[0] == folder_id]:
+            del self._conversations_cache[key]
+
+    @staticmethod
+    def message_page_fingerprint(current_user_email: Optional[str], messages: List) -> Tuple:
+        """
+        Identify what a rendered conversation list depends on
+
+        New, moved and deleted messages change the IDs on the page, and any other change to a
+        message (read, flagged, edited) bumps its lastModifiedDateTime.
+
+        Args:
+            current_user_email: Email of the mailbox user (decides each message's status)
+            messages: Graph SDK messages of the fetched page
+
+        Returns:
+            Hashable fingerprint of the page
+        """
+        return current_user_email, tuple((message.id, message.last_modified_date_time) for message in messages)
+
+    def get_cached_conversations(
+            self,
+            folder_name: str,
+            top: int,
+            include_body: bool,
+            fingerprint: Tuple
+    ) -> Optional[bytes]:
+        """Return the rendered conversations for a folder page if it has not expired or changed since"""
+        cached = self._conversations_cache.get((self._resolve_folder_id(folder_name), top, include_body))
+        if cached is not None and time.monotonic() < cached[0] and cached[1] == fingerprint:
+            return cached[2]
+        return None
+
+    def set_cached_conversations(
+            self,
+            folder_name: str,
+            top: int,
+            include_body: bool,
+            fingerprint: Tuple,
+            body: bytes
+    ):
+        """Cache rendered conversations for CONVERSATIONS_CACHE_TTL_SECONDS, keeping at most CONVERSATIONS_CACHE_MAX_ENTRIES"""
+        key = (self._resolve_folder_id(folder_name), top, include_body)
+        # Re-insert so the dict order is least-recently-stored first, then evict from the front
+        self._conversations_cache.pop(key, None)
+        while len(self._conversations_cache) >= CONVERSATIONS_CACHE_MAX_ENTRIES:
+            del self._conversations_cache[next(iter(self._conversations_cache))]
+        self._conversations_cache[key] = (time.monotonic() + CONVERSATIONS_CACHE_TTL_SECONDS, fingerprint, body)
+
+    @staticmethod
+    def _resolve_folder_id(folder_name: str) -> str:
+        """Map a folder name ('inbox', 'sent') to its Graph well-known folder ID"""
+        folder_name = folder_name.lower()
+        return FOLDER_ID_MAP.get(folder_name, folder_name)
+
+    @staticmethod
+    def _folder_orderby(folder_id: str) -> str:
+        """Get the $orderby clause for a folder (sent items by sent date, others by received date)"""
+        return 'sentDateTime DESC' if folder_id == 'sentitems' else 'receivedDateTime DESC'
+
+    @staticmethod
+    def _decode_attachment_content(content) -> bytes:
+        """Return attachment content as bytes, decoding base64 strings and passing raw bytes through"""
+        if isinstance(content, (bytes, bytearray)):
+            return content
+        return binascii.a2b_base64(content)
+
+    @classmethod
+    def _decode_attachments(cls, attachments: List[Dict[str, str]]) -> List[Tuple[Dict[str, str], bytes]]:
+        """Pair each attachment dict with its decoded content"""
+        return [(attachment, cls._decode_attachment_content(attachment.get("content"))) for attachment in attachments]
+
+    @staticmethod
+    def _attachments_fit_inline(decoded_attachments: List[Tuple[Dict[str, str], bytes]]) -> bool:
+        """Check whether attachments fit in one request body next to the message (and its update/send in a $batch)"""
+        return (len(decoded_attachments) + 2 <= GRAPH_BATCH_LIMIT
+                and sum(len(content_bytes) for _, content_bytes in decoded_attachments) <= BATCH_ATTACHMENT_MAX_BYTES)
+
+    def _folder_messages_builder(self, folder_id: str) -> MessagesRequestBuilder:
+        """Get the messages request builder for a folder, reusing the prebuilt ones for inbox/sentitems"""
+        builder = self._folder_messages_builders.get(folder_id)
+        if builder is None:
+            builder = self.mailbox.mail_folders.by_mail_folder_id(folder_id).messages
+        return builder
+
+    @classmethod
+    def _folder_messages_url(cls, folder_id: str, select: List[str], top: int) -> str:
+        """Build the relative $batch URL listing a folder's newest messages"""
+        query = urlencode(
+            {
+                '$select': ','.join(select),
+                '$top': top,
+                '$orderby': cls._folder_orderby(folder_id)
+            },
+            quote_via=quote,
+            safe='$,'
+        )
+        return f"/users/{GRAPH_USER_ID}/mailFolders/{folder_id}/messages?{query}"
 
     async def create_empty_draft(self) -> str:
         """
@@ -175,11 +753,7 @@ class GraphService:
             message.body.content = ""
 
             # Create draft with ImmutableId preference
-
-            request_config = RequestConfiguration()
-            request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
-
-            draft = await self.user_client.users.by_user_id('sales@powertrans.vn').messages.post(body=message, request_configuration=request_config)
+            draft = await self.mailbox.messages.post(body=message, request_configuration=IMMUTABLE_ID_REQUEST_CONFIG)
 
             logger.info(f"Empty draft created with ID: {draft.id}")
 
@@ -188,9 +762,6 @@ class GraphService:
         except ODataError as e:
             logger.error(f"OData error creating empty draft: {e}")
             raise
-        except Exception as e:
-            logger.error(f"Error creating empty draft: {e}")
-            raise
 
     async def update_draft(self, draft_id: str, subject: str, body: str, recipient: str, body_type: str = "text") -> bool:
         """
@@ -220,20 +791,13 @@ class GraphService:
             message.to_recipients = [to_recipient]
 
             # Update draft with ImmutableId preference
-            request_config = RequestConfiguration()
-            request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
-
-            await self.user_client.users.by_user_id('sales@powertrans.vn').messages.by_message_id(draft_id).patch(body=message, request_configuration=request_config)
+            await self.mailbox.messages.by_message_id(draft_id).patch(body=message, request_configuration=IMMUTABLE_ID_REQUEST_CONFIG)
 
             logger.info(f"Draft {draft_id} updated successfully")
             return True
         except ODataError as e:
             logger.error(f"OData error updating draft: {e}")
             raise
-        except Exception as e:
-            logger.error(f"Error updating draft: {e}")
-
-        raise
 
     async def create_upload_session(
         self,
@@ -254,58 +818,54 @@ class GraphService:
         Returns:
             Upload URL for chunked uploads
         """
-        try:
-            # Get access token
-            token = self.client_credential.get_token("https://graph.microsoft.com/.default").token
-            
-            # Create upload session request body
-            request_body = {
-                "AttachmentItem": {
-                    "attachmentType": "file",
-                    "name": filename,
-                    "size": file_size,
-                    "contentType": content_type
-                }
+        # Get access token
+        token = await self._get_access_token()
+        
+        # Create upload session request body
+        request_body = {
+            "AttachmentItem": {
+                "attachmentType": "file",
+                "name": filename,
+                "size": file_size,
+                "contentType": content_type
             }
+        }
+        
+        # Make direct HTTP request to create upload session
+        url = f"{GRAPH_BASE_URL}/users/{GRAPH_USER_ID}/messages/{draft_id}/attachments/createUploadSession"
+        
+        response = await self.http_client.post(
+            url,
+            content=orjson.dumps(request_body),
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+                "Prefer": IMMUTABLE_ID_PREFER
+            },
+            timeout=30.0,
+            extensions=GRAPH_MIDDLEWARE_EXTENSIONS
+        )
             
-            # Make direct HTTP request to create upload session
-            url = f"https://graph.microsoft.com/v1.0/users/sales@powertrans.vn/messages/{draft_id}/attachments/createUploadSession"
+        # Accept both 200 OK and 201 Created as success
+        if response.status_code not in [200, 201]:
+            error_msg = f"Failed to create upload session: {response.status_code} - {response.text}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json=request_body,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json",
-                        "Prefer": "IdType=\"ImmutableId\""
-                    },
-                    timeout=30.0
-                )
-                
-                # Accept both 200 OK and 201 Created as success
-                if response.status_code not in [200, 201]:
-                    error_msg = f"Failed to create upload session: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    raise Exception(error_msg)
-                
-                result = response.json()
-                upload_url = result.get("uploadUrl")
-                
-                if not upload_url:
-                    raise Exception("Failed to create upload session: no upload URL in response")
-                
-                logger.info(f"Created upload session for {filename} ({file_size} bytes)")
-                return upload_url
+        result = orjson.loads(response.content)
+        upload_url = result.get("uploadUrl")
+            
+        if not upload_url:
+            raise Exception("Failed to create upload session: no upload URL in response")
+            
+        logger.info(f"Created upload session for {filename} ({file_size} bytes)")
+        return upload_url
 
-        except Exception as e:
-            logger.error(f"Error creating upload session: {e}")
-            raise
 
     async def upload_chunk(
         self,
         upload_url: str,
-        chunk_data: bytes,
+        chunk_data: Union[bytes, memoryview],
         range_start: int,
         range_end: int,
         total_size: int
@@ -315,7 +875,7 @@ class GraphService:
 
         Args:
             upload_url: The upload URL from the upload session (includes authtoken)
-            chunk_data: The chunk of data to upload
+            chunk_data: The chunk of data to upload (a memoryview slice is sent without copying)
             range_start: Start byte position (0-based)
             range_end: End byte position (inclusive)
             total_size: Total size of the file
@@ -323,47 +883,43 @@ class GraphService:
         Returns:
             True if successful
         """
-        try:
-            # Content-Range header format: bytes start-end/total
-            content_range = f"bytes {range_start}-{range_end}/{total_size}"
-
-            # Note: The upload_url already contains an authtoken query parameter
-            # We should NOT send an Authorization header - the authtoken in the URL is sufficient
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    upload_url,
-                    content=chunk_data,
-                    headers={
-                        "Content-Length": str(len(chunk_data)),
-                        "Content-Range": content_range
-                    },
-                    timeout=60.0
-                )
+        # Content-Range header format: bytes start-end/total
+        content_range = f"bytes {range_start}-{range_end}/{total_size}"
+
+        # Note: The upload_url already contains an authtoken query parameter
+        # We should NOT send an Authorization header - the authtoken in the URL is sufficient
+        response = await self.http_client.put(
+            upload_url,
+            content=chunk_data if isinstance(chunk_data, bytes) else BytesViewStream(chunk_data),
+            headers={
+                "Content-Length": str(len(chunk_data)),
+                "Content-Range": content_range
+            },
+            timeout=60.0,
+            extensions=GRAPH_MIDDLEWARE_EXTENSIONS
+        )
 
-                if response.status_code not in [200, 201, 202]:
-                    error_msg = f"Upload chunk failed: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    raise Exception(error_msg)
-
-                # When uploading the final chunk, Microsoft Graph returns 201 Created
-                # with the attachment information, confirming the attachment was created
-                is_final_chunk = range_end >= total_size - 1
-                if is_final_chunk and response.status_code == 201:
-                    logger.info(f"Final chunk uploaded successfully. Attachment committed to message.")
-                    # Optionally parse response to verify attachment was created
-                    try:
-                        result = response.json()
-                        if result.get("id"):
-                            logger.info(f"Attachment ID: {result.get('id')}")
-                    except:
-                        pass  # Response might not be JSON
-
-                logger.debug(f"Uploaded chunk {range_start}-{range_end}/{total_size}")
-                return True
+        if response.status_code not in [200, 201, 202]:
+            error_msg = f"Upload chunk failed: {response.status_code} - {response.text}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+
+        # When uploading the final chunk, Microsoft Graph returns 201 Created
+        # with the attachment information, confirming the attachment was created
+        is_final_chunk = range_end >= total_size - 1
+        if is_final_chunk and response.status_code == 201:
+            logger.info(f"Final chunk uploaded successfully. Attachment committed to message.")
+            # Optionally parse response to verify attachment was created
+            try:
+                result = orjson.loads(response.content)
+                if result.get("id"):
+                    logger.info(f"Attachment ID: {result.get('id')}")
+            except:
+                pass  # Response might not be JSON
+
+        logger.debug(f"Uploaded chunk {range_start}-{range_end}/{total_size}")
+        return True
 
-        except Exception as e:
-            logger.error(f"Error uploading chunk: {e}")
-            raise
 
     async def upload_large_file_to_draft(
         self,
@@ -388,94 +944,103 @@ class GraphService:
         Returns:
             True if successful
         """
-        try:
-            file_size = len(file_content)
-
-            # Create upload session
-            upload_url = await self.create_upload_session(
-                draft_id=draft_id,
-                filename=filename,
-                file_size=file_size,
-                content_type=content_type
+        file_size = len(file_content)
+
+        # Create upload session
+        upload_url = await self.create_upload_session(
+            draft_id=draft_id,
+            filename=filename,
+            file_size=file_size,
+            content_type=content_type
+        )
+
+        # Upload file in chunks, slicing a view so no chunk is copied out of file_content
+        file_view = memoryview(file_content)
+        bytes_uploaded = 0
+        chunk_number = 0
+        total_chunks = (file_size + chunk_size - 1) // chunk_size  # Ceiling division
+
+        while bytes_uploaded < file_size:
+            # Calculate chunk boundaries
+            range_start = bytes_uploaded
+            range_end = min(bytes_uploaded + chunk_size - 1, file_size - 1)
+            chunk_data = file_view[range_start:range_end + 1]
+
+            # Upload chunk
+            await self.upload_chunk(
+                upload_url=upload_url,
+                chunk_data=chunk_data,
+                range_start=range_start,
+                range_end=range_end,
+                total_size=file_size
             )
 
-            # Upload file in chunks
-            bytes_uploaded = 0
-            chunk_number = 0
-            total_chunks = (file_size + chunk_size - 1) // chunk_size  # Ceiling division
-
-            while bytes_uploaded < file_size:
-                # Calculate chunk boundaries
-                range_start = bytes_uploaded
-                range_end = min(bytes_uploaded + chunk_size - 1, file_size - 1)
-                chunk_data = file_content[range_start:range_end + 1]
-
-                # Upload chunk
-                await self.upload_chunk(
-                    upload_url=upload_url,
-                    chunk_data=chunk_data,
-                    range_start=range_start,
-                    range_end=range_end,
-                    total_size=file_size
-                )
+            bytes_uploaded = range_end + 1
+            chunk_number += 1
 
-                bytes_uploaded = range_end + 1
-                chunk_number += 1
+            # Call progress callback if provided (update after each chunk)
+            if progress_callback:
+                progress_callback(bytes_uploaded, file_size)
 
-                # Call progress callback if provided (update after each chunk)
-                if progress_callback:
-                    progress_callback(bytes_uploaded, file_size)
+            logger.info(f"Uploaded chunk {chunk_number}/{total_chunks}: {bytes_uploaded}/{file_size} bytes ({bytes_uploaded * 100 // file_size}%)")
 
-                logger.info(f"Uploaded chunk {chunk_number}/{total_chunks}: {bytes_uploaded}/{file_size} bytes ({bytes_uploaded * 100 // file_size}%)")
+        logger.info(f"Successfully uploaded large file {filename} ({file_size} bytes) in {chunk_number} chunks")
+        return True
 
-            logger.info(f"Successfully uploaded large file {filename} ({file_size} bytes) in {chunk_number} chunks")
-            return True
-
-        except Exception as e:
-            logger.error(f"Error uploading large file: {e}")
-            raise
 
     async def add_attachments_to_draft(self, draft_id: str, attachments: List[Dict[str, str]]) -> bool:
         """
         Add attachments to an existing draft email message
 
+        Attachments are uploaded concurrently (up to ATTACHMENT_UPLOAD_CONCURRENCY at a time);
+        those larger than 3MB go through the upload session API.
+
         Args:
             draft_id: The immutable ID of the draft message
-            attachments: List of attachment dictionaries with 'name', 'content' (base64), and 'content_type'
+            attachments: List of attachment dictionaries with 'name', 'content' (base64 str or raw bytes), and 'content_type'
 
         Returns:
             True if successful
         """
         try:
-            for attachment in attachments:
-                file_attachment = FileAttachment()
-                file_attachment.name = attachment.get("name")
-                file_attachment.content_type = attachment.get("content_type")
-                
-                # Decode base64 content
-                content_bytes = base64.b64decode(attachment.get("content"))
-                file_attachment.content_bytes = content_bytes
-                # Use provided size if available, otherwise calculate from decoded content
-                file_attachment.size = attachment.get("size") or len(content_bytes)
-                file_attachment.is_inline = False
-
-                # Add attachment with ImmutableId preference
-                request_config = RequestConfiguration()
-                request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
-
-                await self.user_client.users.by_user_id('sales@powertrans.vn').messages.by_message_id(draft_id).attachments.post(
-                    body=file_attachment,
-                    request_configuration=request_config
-                )
+            semaphore = asyncio.Semaphore(ATTACHMENT_UPLOAD_CONCURRENCY)
+
+            async def add_attachment(attachment: Dict[str, str]):
+                content_bytes = self._decode_attachment_content(attachment.get("content"))
+
+                async with semaphore:
+                    # Graph rejects attachment POSTs above 3MB, those need an upload session
+                    if len(content_bytes) > SIMPLE_ATTACHMENT_MAX_BYTES:
+                        await self.upload_large_file_to_draft(
+                            draft_id=draft_id,
+                            file_content=content_bytes,
+                            filename=attachment.get("name"),
+                            content_type=attachment.get("content_type") or "application/octet-stream"
+                        )
+                        return
+
+                    file_attachment = FileAttachment()
+                    file_attachment.name = attachment.get("name")
+                    file_attachment.content_type = attachment.get("content_type")
+                    file_attachment.content_bytes = content_bytes
+                    # Use provided size if available, otherwise calculate from decoded content
+                    file_attachment.size = attachment.get("size") or len(content_bytes)
+                    file_attachment.is_inline = False
+
+                    await self.mailbox.messages.by_message_id(draft_id).attachments.post(
+                        body=file_attachment,
+                        # Add attachment with ImmutableId preference
+                        request_configuration=IMMUTABLE_ID_REQUEST_CONFIG
+                    )
+
+            # Upload concurrently so the total time is close to the slowest upload rather than the sum
+            await asyncio.gather(*(add_attachment(attachment) for attachment in attachments))
 
             logger.info(f"Added {len(attachments)} attachment(s) to draft {draft_id}")
             return True
         except ODataError as e:
             logger.error(f"OData error adding attachments to draft: {e}")
             raise
-        except Exception as e:
-            logger.error(f"Error adding attachments to draft: {e}")
-            raise
 
     async def send_draft(self, draft_id: str) -> Optional[str]:
         """
@@ -490,12 +1055,11 @@ class GraphService:
 
         try:
             # Send with ImmutableId preference
-            request_config = RequestConfiguration()
-            request_config.headers.add("Prefer", "IdType=\"ImmutableId\"")
-
-            await self.user_client.users.by_user_id('sales@powertrans.vn').messages.by_message_id(draft_id).send.post(request_configuration=request_config)
+            await self.mailbox.messages.by_message_id(draft_id).send.post(request_configuration=IMMUTABLE_ID_REQUEST_CONFIG)
 
             logger.info(f"Draft {draft_id} sent successfully")
+            # The sent folder has changed, so cached pages of it are stale
+            self._invalidate_cached_message_pages('sentitems')
             # The sent message should have the same ImmutableId as the draft
             return draft_id
 
@@ -503,76 +1067,177 @@ class GraphService:
             logger.error(f"OData error sending draft: {e}")
 
             raise
-        except Exception as e:
-            logger.error(f"Error sending draft: {e}")
-            raise
 
+    async def update_and_send_draft(
+            self,
+            draft_id: str,
+            subject: str,
+            body: str,
+            recipient: str,
+            body_type: str = "text",
+            attachments: Optional[List[Dict[str, str]]] = None
+    ) -> Optional[str]:
+        """
+        Update a draft, attach files and send it in a single Graph $batch round trip
 
-    async def get_all_messages(self, inbox_top: int = 50, sent_top: int = 50):
-        """Get messages from both inbox and sent folders"""
-        try:
-            # Fetch messages from both folders concurrently
-            inbox_task = self.get_inbox(inbox_top)
-            sent_task = self.get_sent(sent_top)
-
-            inbox_messages, sent_messages = await asyncio.gather(inbox_task, sent_task)
+        The send sub-request dependsOn the update and every attachment, so Graph only sends the
+        draft once they all succeeded. Attachments too large or too many to inline in the batch
+        are added beforehand with add_attachments_to_draft.
 
-            all_messages = []
-            if inbox_messages and inbox_messages.value:
-                all_messages.extend(inbox_messages.value)
-            if sent_messages and sent_messages.value:
-                all_messages.extend(sent_messages.value)
+        Args:
+            draft_id: The immutable ID of the draft message
+            subject: Email subject
+            body: Email body content
+            recipient: Recipient email address
+            body_type: Content type ("text" or "html")
+            attachments: Optional list of attachment dictionaries with 'name', 'content' (base64 str or raw bytes), and 'content_type'
 
-            return all_messages
-        except Exception as e:
-            logger.error(f"Error getting all messages: {e}")
+        Returns:
+            The immutable ID of the sent message (same as draft_id if using ImmutableId)
+        """
+        try:
+            attachments = attachments or []
+            decoded_attachments = self._decode_attachments(attachments)
+            # The chain has to fit in one $batch call (update + attachments + send) to keep its dependsOn links
+            if not self._attachments_fit_inline(decoded_attachments):
+                await self.add_attachments_to_draft(draft_id, attachments)
+                decoded_attachments = []
+
+            message_url = f"/users/{GRAPH_USER_ID}/messages/{draft_id}"
+            json_headers = {"Content-Type": "application/json", "Prefer": IMMUTABLE_ID_PREFER}
+            sub_requests = [
+                {
+                    "id": "update",
+                    "method": "PATCH",
+                    "url": message_url,
+                    "headers": json_headers,
+                    "body": {
+                        "subject": subject,
+                        "body": {
+                            "contentType": "html" if body_type.lower() == "html" else "text",
+                            "content": body
+                        },
+                        "toRecipients": [{"emailAddress": {"address": recipient}}]
+                    }
+                }
+            ]
+            for index, (attachment, content_bytes) in enumerate(decoded_attachments):
+                sub_requests.append({
+                    "id": f"attachment-{index}",
+                    "method": "POST",
+                    "url": f"{message_url}/attachments",
+                    "headers": json_headers,
+                    "body": {
+                        "@odata.type": "#microsoft.graph.fileAttachment",
+                        "name": attachment.get("name"),
+                        "contentType": attachment.get("content_type"),
+                        "contentBytes": base64.b64encode(content_bytes).decode("ascii"),
+                        "size": attachment.get("size") or len(content_bytes),
+                        "isInline": False
+                    }
+                })
+            sub_requests.append({
+                "id": "send",
+                "method": "POST",
+                "url": f"{message_url}/send",
+                "headers": {"Prefer": IMMUTABLE_ID_PREFER},
+                "dependsOn": [sub_request["id"] for sub_request in sub_requests]
+            })
+
+            responses = await self._batch(sub_requests)
+
+            # Raise the first failure in request order; later requests then failed with 424 Failed Dependency
+            for sub_request in sub_requests:
+                self._raise_for_batch_error(responses[sub_request["id"]])
+
+            logger.info(f"Draft {draft_id} updated with {len(decoded_attachments)} batched attachment(s) and sent")
+            # The sent folder has changed, so cached pages of it are stale
+            self._invalidate_cached_message_pages('sentitems')
+            return draft_id
+        except ODataError as e:
+            logger.error(f"OData error updating and sending draft: {e}")
             raise
 
-
-    def group_messages_by_conversation(self, inbox_messages: List, sent_messages: List) -> Dict[str, List]:
+    async def send_mail(
+            self,
+            subject: str,
+            body: str,
+            recipient: str,
+            body_type: str = "text",
+            attachments: Optional[List[Dict[str, str]]] = None
+    ) -> bool:
         """
-        Group messages by conversation ID based on sent folder conversation IDs
+        Send an email in a single sendMail call, without creating a draft first
+
+        Graph caps request bodies at 4MB, so when the attachments are too large or too many to
+        inline, the email goes through a draft instead (see update_and_send_draft).
 
         Args:
-            inbox_messages: List of inbox message objects from Microsoft Graph
-            sent_messages: List of sent message objects from Microsoft Graph
+            subject: Email subject
+            body: Email body content
+            recipient: Recipient email address
+            body_type: Content type ("text" or "html")
+            attachments: Optional list of attachment dictionaries with 'name', 'content' (base64 str or raw bytes), and 'content_type'
 
         Returns:
-            Dictionary where keys are conversation IDs from sent messages and values are lists of all related messages
+            True if successful
         """
-        # First, collect all conversation IDs from sent messages
-        sent_conversation_ids = set()
-        for message in sent_messages:
-            conversation_id = self._get_conversation_id(message)
-            sent_conversation_ids.add(conversation_id)
-
-        # Now find all messages (both inbox and sent) that match these conversation IDs
-        conversations = {}
-
-        for conversation_id in sent_conversation_ids:
-            conversation_messages = []
-
-            # Add all sent messages with this conversation ID
-            for message in sent_messages:
-                if self._get_conversation_id(message) == conversation_id:
-                    conversation_messages.append(message)
-
-            # Add all inbox messages with this conversation ID
-            for message in inbox_messages:
-                if self._get_conversation_id(message) == conversation_id:
-                    conversation_messages.append(message)
-
-            # Only include conversations that have at least one sent message
-            if conversation_messages:
-                # Sort messages within each conversation by received/sent date
-                conversation_messages.sort(
-                    key=lambda msg: getattr(msg, 'received_date_time', None) or getattr(msg, 'sent_date_time', None) or '',
-                    reverse=False  # Oldest first for conversation flow
+        try:
+            decoded_attachments = self._decode_attachments(attachments or [])
+            if not self._attachments_fit_inline(decoded_attachments):
+                draft_id = await self.create_empty_draft()
+                # Hand over the decoded bytes so they are not decoded a second time
+                await self.update_and_send_draft(
+                    draft_id=draft_id,
+                    subject=subject,
+                    body=body,
+                    recipient=recipient,
+                    body_type=body_type,
+                    attachments=[
+                        {**attachment, "content": content_bytes}
+                        for attachment, content_bytes in decoded_attachments
+                    ]
                 )
+                logger.info(f"Email sent to {recipient} via draft {draft_id} ({len(decoded_attachments)} attachment(s))")
+                return True
 
-                conversations[conversation_id] = conversation_messages
+            message = Message()
+            message.subject = subject
+
+            message.body = ItemBody()
+            message.body.content_type = BodyType.Html if body_type.lower() == "html" else BodyType.Text
+            message.body.content = body
+
+            to_recipient = Recipient()
+            to_recipient.email_address = EmailAddress()
+            to_recipient.email_address.address = recipient
+            message.to_recipients = [to_recipient]
+
+            if decoded_attachments:
+                message.attachments = []
+                for attachment, content_bytes in decoded_attachments:
+                    file_attachment = FileAttachment()
+                    file_attachment.name = attachment.get("name")
+                    file_attachment.content_type = attachment.get("content_type")
+                    file_attachment.content_bytes = content_bytes
+                    file_attachment.size = attachment.get("size") or len(content_bytes)
+                    file_attachment.is_inline = False
+                    message.attachments.append(file_attachment)
+
+            request_body = SendMailPostRequestBody()
+            request_body.message = message
+            request_body.save_to_sent_items = True
+
+            await self.mailbox.send_mail.post(body=request_body)
+
+            logger.info(f"Email sent to {recipient} via sendMail")
+            # The sent folder has changed, so cached pages of it are stale
+            self._invalidate_cached_message_pages('sentitems')
+            return True
+        except ODataError as e:
+            logger.error(f"OData error sending mail: {e}")
+            raise
 
-        return conversations
 
     def group_messages_by_conversation_single_folder(self, messages: List) -> Dict[str, List]:
         """
@@ -584,80 +1249,50 @@ class GraphService:
         Returns:
             Dictionary where keys are conversation IDs and values are lists of messages in that conversation
         """
-        conversations = {}
-        
+        conversations = defaultdict(list)
+
         for message in messages:
             conversation_id = self._get_conversation_id(message)
             if conversation_id:
-                if conversation_id not in conversations:
-                    conversations[conversation_id] = []
                 conversations[conversation_id].append(message)
-        
-        # Sort messages within each conversation by received/sent date
-        for conversation_id in conversations:
-            conversations[conversation_id].sort(
-                key=lambda msg: getattr(msg, 'received_date_time', None) or getattr(msg, 'sent_date_time', None) or '',
-                reverse=False  # Oldest first for conversation flow
-            )
-        
-        return conversations
 
-    def _get_conversation_id(self, message) -> str:
-        """
-        Extract conversation ID from a message, with fallbacks
+        # Sort messages within each conversation by received/sent date, oldest first for conversation flow
+        for conversation_messages in conversations.values():
+            conversation_messages.sort(key=self._message_sort_key)
 
-        Args:
-            message: Message object from Microsoft Graph
+        return dict(conversations)
 
-        Returns:
-            Conversation ID string
+    @staticmethod
+    def _message_sort_key(message) -> datetime:
         """
-        # Get conversation ID, fallback to internet message ID if conversation ID is not available
-        conversation_id = getattr(message, 'conversation_id', None)
-        if not conversation_id:
-            conversation_id = getattr(message, 'internet_message_id', None)
-
-        # If still no ID, create a unique ID based on subject and participants
-        if not conversation_id:
-            subject = getattr(message, 'subject', 'No Subject')
-            from_email = ''
-            if hasattr(message, 'from_') and message.from_ and hasattr(message.from_, 'email_address'):
-                from_email = getattr(message.from_.email_address, 'address', '')
-            conversation_id = f"subject_{hash(subject + from_email)}"
-
-        return conversation_id
+        Chronological sort key for a message
 
+        Falls back to an aware datetime.min (never '') so messages without timestamps sort
+        first instead of raising TypeError when compared against datetimes.
+        """
+        return message.received_date_time or message.sent_date_time or MESSAGE_TIME_MIN
 
-    async def get_conversations(self, inbox_top: int = 50, sent_top: int = 50) -> Dict[str, List]:
+    def _get_conversation_id(self, message) -> str:
         """
-        Get conversations based on conversation IDs from sent folder, including all related messages
+        Extract conversation ID from a message, with fallbacks
 
         Args:
-            inbox_top: Maximum number of inbox messages to fetch
-            sent_top: Maximum number of sent messages to fetch
+            message: Message object from Microsoft Graph
 
         Returns:
-            Dictionary where keys are conversation IDs from sent messages and values are lists of all related messages
+            Conversation ID string
         """
-        try:
-            # Get messages from both folders separately
-            inbox_task = self.get_inbox(inbox_top)
-            sent_task = self.get_sent(sent_top)
+        # Get conversation ID, fallback to internet message ID if conversation ID is not available.
+        # SDK message fields default to None, so they can be read directly
+        conversation_id = message.conversation_id or message.internet_message_id
+        if conversation_id:
+            return conversation_id
 
-            inbox_response, sent_response = await asyncio.gather(inbox_task, sent_task)
-
-            # Extract message lists
-            inbox_messages = inbox_response.value if inbox_response and inbox_response.value else []
-            sent_messages = sent_response.value if sent_response and sent_response.value else []
-
-            # Group messages by conversation (only those with messages in both folders)
-            conversations = self.group_messages_by_conversation(inbox_messages, sent_messages)
-
-            total_messages = len(inbox_messages) + len(sent_messages)
-            logger.info(
-                f"Found {len(conversations)} conversations based on sent folder conversation IDs (from {total_messages} total messages)")
-            return conversations
-
-        except Exception as e:
-            logger.error(f"Error getting conversations: {e}")
-            raise
+        # If still no ID, create a unique ID based on subject and participants
+        subject = message.subject or 'No Subject'
+        from_email = ''
+        if message.from_ and message.from_.email_address:
+            from_email = message.from_.email_address.address or ''
+        # blake2b instead of hash(): str hashes are salted per process, so the ID would change on every restart
+        digest = hashlib.blake2b(f"{subject}\x1f{from_email}".encode(), digest_size=8).hexdigest()
+        return f"subject_{digest}"
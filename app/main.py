@@ -1,11 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from msgraph.generated.models.o_data_errors.o_data_error import ODataError
 from app.api.routes import router
 from app.config import settings
 from app.models import ErrorResponse
 from app.graph_service import GraphService
-from app.dependencies import set_graph_service
+from app import dependencies
+from app.dependencies import set_graph_service, set_upload_progress_service
+from app.mongodb_service import mongodb_service
+from app.upload_progress_service import UploadProgressService
 import logging
 import sys
 import asyncio
@@ -27,7 +31,8 @@ app = FastAPI(
     version=settings.app_version,
     description="API for email management using Microsoft Graph",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -66,7 +71,22 @@ async def initialize_graph_service():
 # Startup event
 @app.on_event("startup")
 async def startup_event():
+    # Created here, inside the running loop, so its cleanup task lives on the server's loop
+    set_upload_progress_service(UploadProgressService())
     await initialize_graph_service()
+    # Connect per worker after fork; the startup ping blocks, so keep it off the event loop
+    await asyncio.to_thread(mongodb_service.connect)
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close the Graph service's shared HTTP connection pool
+    if dependencies.graph_service is not None:
+        await dependencies.graph_service.close()
+    # Stop the tracking change stream thread (if any) and the MongoDB connection pool
+    mongodb_service.close()
+    if dependencies.upload_progress_service is not None:
+        await dependencies.upload_progress_service.close()
 
 # Include API routes
 app.include_router(router, prefix="/api/v1", tags=["Email Management"])
@@ -74,7 +94,7 @@ app.include_router(router, prefix="/api/v1", tags=["Email Management"])
 # Global exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content=ErrorResponse(
             error=exc.detail,
@@ -82,10 +102,21 @@ async def http_exception_handler(request, exc):
         ).dict()
     )
 
+@app.exception_handler(ODataError)
+async def odata_error_handler(request, exc):
+    logger.error(f"Graph API error on {request.method} {request.url.path}: {exc}")
+    return ORJSONResponse(
+        status_code=400,
+        content=ErrorResponse(
+            error=f"Graph API error: {exc.error.message if exc.error else str(exc)}",
+            status_code=400
+        ).dict()
+    )
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    logger.error(f"Unhandled exception on {request.method} {request.url.path}: {exc}")
+    return ORJSONResponse(
         status_code=500,
         content=ErrorResponse(
             error="Internal server error",
@@ -110,5 +141,7 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.debug
+        reload=settings.debug,
+        loop="uvloop",
+        http="httptools"
     )
@@ -13,6 +13,7 @@ from .email import (
     FollowupFlag,
     Attachment,
     EmailMessage,
+    MessageType,
 )
 from .conversation import Conversation
 from .responses import (
@@ -44,6 +45,7 @@ __all__ = [
     "FollowupFlag",
     "Attachment",
     "EmailMessage",
+    "MessageType",
     "Conversation",
     "UserResponse",
     "InboxResponse",
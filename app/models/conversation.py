@@ -2,7 +2,7 @@ from typing import List
 
 from pydantic import BaseModel
 
-from .email import EmailMessage
+from .email import EmailMessage, MessageType
 
 
 class Conversation(BaseModel):
@@ -11,5 +11,5 @@ class Conversation(BaseModel):
     conversation_id: str
     messages: List[EmailMessage]
     total_messages: int
-    last_message_status: str  # "initial", "reply", or "follow_up"
+    last_message_status: MessageType
 
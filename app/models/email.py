@@ -1,9 +1,20 @@
 from datetime import datetime
+from enum import Enum
 from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
 
+class MessageType(str, Enum):
+    """Position of a message in its conversation flow"""
+
+    INITIAL = "initial"
+    REPLY = "reply"
+    FOLLOW_UP = "follow_up"
+    NUDGE = "nudge"
+    UNKNOWN = "unknown"
+
+
 class EmailAddress(BaseModel):
     """Email address model"""
 
@@ -79,7 +90,7 @@ class EmailMessage(BaseModel):
     to_recipients: Optional[List[Recipient]] = Field(default=None, alias="toRecipients")
     unique_body: Optional[ItemBody] = Field(default=None, alias="uniqueBody")
     attachments: Optional[List[Attachment]] = None
-    message_type: str = "unknown"  # "initial", "reply", "follow_up", or "nudge"
+    message_type: MessageType = MessageType.UNKNOWN
     is_from_current_user: bool = False
 
     model_config = ConfigDict(populate_by_name=True)
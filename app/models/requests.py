@@ -2,6 +2,8 @@ from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 
+from .conversation import Conversation
+
 
 class AttachmentRequest(BaseModel):
     """Request model for email attachment"""
@@ -49,18 +51,10 @@ class SendEmailRequest(BaseModel):
 class FilterConversationsRequest(BaseModel):
     """Request model for filtering conversations"""
 
-    conversations: List["Conversation"]
+    conversations: List[Conversation]
 
 
 class FilterNudgingConversationsRequest(BaseModel):
     """Request model for filtering conversations that need nudging"""
 
-    conversations: List["Conversation"]
-
-
-from .conversation import Conversation  # noqa: E402  (circular import)
-
-FilterConversationsRequest.model_rebuild()
-FilterNudgingConversationsRequest.model_rebuild()
-
-
+    conversations: List[Conversation]
@@ -101,6 +101,8 @@ class EmailTrackingResponse(BaseModel):
     createdAt: Optional[datetime] = None
     views: List[EmailView] = []
     total_views: int = 0
+    offset: Optional[int] = None  # Only set for paginated requests
+    limit: Optional[int] = None
 
 
 class UploadProgressResponse(BaseModel):
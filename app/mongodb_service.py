@@ -1,6 +1,8 @@
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime, timezone
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+from datetime import timezone
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 from pymongo.errors import ConnectionFailure, PyMongoError
@@ -8,29 +10,73 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = 5000  # Fail the startup ping fast instead of pymongo's 30 s default
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = 2000  # Give up on a pooled connection rather than queueing a request indefinitely
+TRACKING_CACHE_TTL_SECONDS = 5  # Tracking dashboards re-poll the same UUID every few seconds
+TRACKING_CACHE_MISS_TTL_SECONDS = 1  # Unknown UUIDs are remembered briefly so repeated polls do not all hit MongoDB
+TRACKING_CACHE_MAX_ENTRIES = 4096
+TRACKING_VIEW_FIELDS = ("timestamp", "ip", "userAgent", "referrer")  # Scalar fields of a view (EmailView)
+# Nested objects of a view and their fields (BrowserInfo, DeviceInfo, OSInfo, LocationInfo)
+TRACKING_VIEW_OBJECT_FIELDS = {
+    "browser": ("name", "version"),
+    "device": ("type", "name"),
+    "os": ("name", "version"),
+    "location": ("country", "city", "latitude", "longitude", "isp", "district")
+}
+# Only the fields of the tracking response, so other document/view fields are never sent or decoded
+TRACKING_PROJECTION = {
+    "uuid": 1,
+    "createdAt": 1,
+    **{f"views.{field}": 1 for field in TRACKING_VIEW_FIELDS},
+    **{
+        f"views.{field}.{subfield}": 1
+        for field, subfields in TRACKING_VIEW_OBJECT_FIELDS.items()
+        for subfield in subfields
+    }
+}
+# While the change stream pushes updates into the cache, entries only expire as a safety net for missed events
+TRACKING_WATCHED_CACHE_TTL_SECONDS = 300
+TRACKING_WATCH_MAX_AWAIT_MS = 1000  # How long one change stream poll waits, bounding how quickly close() stops it
+TRACKING_WATCH_RETRY_SECONDS = 5  # Pause before reopening a change stream that failed
+TRACKING_WATCH_PIPELINE = [
+    {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+    # Same field set as the queries; the event _id (the resume token) is always kept
+    {"$project": {"fullDocument._id": 1, **{f"fullDocument.{field}": 1 for field in TRACKING_PROJECTION}}}
+]
 
-def _normalize_to_utc(dt) -> Optional[datetime]:
+
+def _process_tracking_document(document: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Normalize datetime to UTC timezone (+00:00)
-    
+    Convert a tracking document to the tracking data returned by get_tracking_data
+
     Args:
-        dt: datetime object (may be naive or timezone-aware)
-        
+        document: Raw tracking document from MongoDB
+
     Returns:
-        timezone-aware datetime in UTC, or None if dt is None
+        Dictionary with a string _id. The decoded view dicts are reused rather than copied
+        (TRACKING_PROJECTION already limits them to the known view fields); fields a view never
+        recorded are filled in with None here, once per fetched document, so the views can be
+        serialized as is. Dates are already UTC-aware, since the client decodes them that way.
     """
-    if dt is None:
-        return None
-    
-    if isinstance(dt, datetime):
-        if dt.tzinfo is None:
-            # Naive datetime - assume UTC
-            return dt.replace(tzinfo=timezone.utc)
-        else:
-            # Timezone-aware datetime - convert to UTC
-            return dt.astimezone(timezone.utc)
-    
-    return dt
+    views = document.get("views") or []
+    for view in views:
+        for field in TRACKING_VIEW_FIELDS:
+            view.setdefault(field, None)
+        for field, subfields in TRACKING_VIEW_OBJECT_FIELDS.items():
+            nested = view.get(field)
+            if not nested:
+                view[field] = None
+                continue
+            for subfield in subfields:
+                nested.setdefault(subfield, None)
+
+    # Convert ObjectId to string
+    return {
+        "_id": str(document.get("_id", "")),
+        "uuid": document.get("uuid"),
+        "createdAt": document.get("createdAt"),
+        "views": views
+    }
 
 
 class MongoDBService:
@@ -40,10 +86,23 @@ class MongoDBService:
         self.client: Optional[MongoClient] = None
         self.db = None
         self.collection = None
-        self._connect()
+        # UUID -> (expires_at, processed tracking data or None when not found)
+        self._tracking_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        # Guards cache writes, which come from request worker threads and the change stream thread
+        self._tracking_cache_lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
     
-    def _connect(self):
-        """Initialize MongoDB connection"""
+    def connect(self):
+        """
+        Initialize MongoDB connection
+        
+        Called from the app's startup hook rather than at import, so each worker process opens
+        its own pool after it has been forked. Does nothing if already connected.
+        """
+        if self.client is not None:
+            return
+        
         try:
             if not settings.mongodb_connection_string:
                 logger.warning("MongoDB connection string not provided. Tracking features will be unavailable.")
@@ -51,7 +110,13 @@ class MongoDBService:
             
             self.client = MongoClient(
                 settings.mongodb_connection_string,
-                server_api=ServerApi('1')
+                server_api=ServerApi('1'),
+                # Decode BSON dates straight to UTC-aware datetimes instead of normalizing every view afterwards
+                tz_aware=True,
+                tzinfo=timezone.utc,
+                maxPoolSize=settings.mongodb_max_pool_size,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS
             )
             
             # Test connection
@@ -61,6 +126,10 @@ class MongoDBService:
             # Get database and collection
             self.db = self.client[settings.mongodb_database]
             self.collection = self.db[settings.mongodb_collection]
+            self._ensure_indexes()
+
+            if settings.mongodb_watch_tracking:
+                self._start_tracking_watch()
             
         except ConnectionFailure as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
@@ -69,9 +138,21 @@ class MongoDBService:
             logger.error(f"Error initializing MongoDB connection: {e}")
             self.client = None
     
+    def _ensure_indexes(self):
+        """Make sure tracking lookups by UUID are a single index probe (a no-op when the index exists)"""
+        try:
+            self.collection.create_index("uuid")
+        except PyMongoError as e:
+            # Read-only credentials cannot create indexes; lookups still work, just slower
+            logger.warning(f"Could not ensure the uuid index on the tracking collection: {e}")
+
     def get_tracking_data(self, message_id: str) -> Optional[Dict[str, Any]]:
         """
         Get tracking data for a message ID (UUID)
+
+        Results are cached for TRACKING_CACHE_TTL_SECONDS (TRACKING_CACHE_MISS_TTL_SECONDS when
+        not found). With the mongodb_watch_tracking setting, a change stream keeps cached UUIDs
+        up to date instead, so repeated polls are served from memory.
         
         Args:
             message_id: The UUID of the message to get tracking data for
@@ -82,38 +163,24 @@ class MongoDBService:
         if self.collection is None:
             logger.error("MongoDB collection not available")
             return None
+
+        cached = self._tracking_cache.get(message_id)
+        if cached is not None and time.monotonic() < cached[0]:
+            logger.debug(f"Tracking cache hit for message ID: {message_id}")
+            return cached[1]
+        logger.debug(f"Tracking cache miss for message ID: {message_id}")
         
         try:
             # Query by UUID field
-            document = self.collection.find_one({"uuid": message_id})
+            document = self.collection.find_one({"uuid": message_id}, TRACKING_PROJECTION)
             
             if not document:
                 logger.info(f"No tracking data found for message ID: {message_id}")
+                self._set_cached_tracking_data(message_id, None)
                 return None
-            
-            # Convert ObjectId to string and handle date objects
-            result = {
-                "_id": str(document.get("_id", "")),
-                "uuid": document.get("uuid"),
-                "createdAt": _normalize_to_utc(document.get("createdAt")),
-                "views": []
-            }
-            
-            # Process views array
-            views = document.get("views", [])
-            for view in views:
-                view_data = {
-                    "timestamp": _normalize_to_utc(view.get("timestamp")),
-                    "ip": view.get("ip"),
-                    "userAgent": view.get("userAgent"),
-                    "referrer": view.get("referrer"),
-                    "browser": view.get("browser"),
-                    "device": view.get("device"),
-                    "os": view.get("os"),
-                    "location": view.get("location")
-                }
-                result["views"].append(view_data)
-            
+
+            result = _process_tracking_document(document)
+            self._set_cached_tracking_data(message_id, result)
             return result
             
         except PyMongoError as e:
@@ -123,8 +190,140 @@ class MongoDBService:
             logger.error(f"Unexpected error getting tracking data: {e}")
             return None
     
+    def get_tracking_data_page(self, message_id: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Get tracking data for a message ID (UUID) with only one page of its views
+
+        A cached document is sliced in memory; otherwise MongoDB slices the views array with an
+        aggregation, so long view histories are never fully transferred. Pages are not cached.
+
+        Args:
+            message_id: The UUID of the message to get tracking data for
+            offset: Number of views to skip
+            limit: Maximum number of views to return
+
+        Returns:
+            Dictionary like get_tracking_data's plus "total_views" (the size of the full views
+            array), or None if not found
+        """
+        if self.collection is None:
+            logger.error("MongoDB collection not available")
+            return None
+
+        cached = self._tracking_cache.get(message_id)
+        if cached is not None and time.monotonic() < cached[0]:
+            if cached[1] is None:
+                return None
+            views = cached[1]["views"]
+            return {**cached[1], "views": views[offset:offset + limit], "total_views": len(views)}
+
+        try:
+            document = next(self.collection.aggregate([
+                {"$match": {"uuid": message_id}},
+                {"$limit": 1},
+                {"$project": {
+                    "uuid": 1,
+                    "createdAt": 1,
+                    "total_views": {"$size": {"$ifNull": ["$views", []]}},
+                    "views": {"$slice": [{"$ifNull": ["$views", []]}, offset, limit]}
+                }},
+                {"$project": {**TRACKING_PROJECTION, "total_views": 1}}
+            ]), None)
+
+            if not document:
+                logger.info(f"No tracking data found for message ID: {message_id}")
+                return None
+
+            result = _process_tracking_document(document)
+            result["total_views"] = document["total_views"]
+            return result
+
+        except PyMongoError as e:
+            logger.error(f"MongoDB error getting tracking data page: {e}")
+            return None
+
+    def _set_cached_tracking_data(
+            self,
+            message_id: str,
+            result: Optional[Dict[str, Any]],
+            only_if_cached: bool = False
+    ):
+        """
+        Cache processed tracking data (or a miss), keeping at most TRACKING_CACHE_MAX_ENTRIES UUIDs
+
+        Args:
+            message_id: The UUID the data belongs to
+            result: Processed tracking data, or None when the UUID has no document
+            only_if_cached: Only refresh an existing entry (used for change stream events)
+        """
+        if self._watch_thread is not None:
+            ttl = TRACKING_WATCHED_CACHE_TTL_SECONDS
+        elif result is not None:
+            ttl = TRACKING_CACHE_TTL_SECONDS
+        else:
+            ttl = TRACKING_CACHE_MISS_TTL_SECONDS
+
+        with self._tracking_cache_lock:
+            if only_if_cached and message_id not in self._tracking_cache:
+                return
+            # Re-insert so the dict order is least-recently-stored first, then evict from the front
+            self._tracking_cache.pop(message_id, None)
+            while len(self._tracking_cache) >= TRACKING_CACHE_MAX_ENTRIES:
+                del self._tracking_cache[next(iter(self._tracking_cache))]
+            self._tracking_cache[message_id] = (time.monotonic() + ttl, result)
+
+    def _start_tracking_watch(self):
+        """Start the background thread that pushes tracking document changes into the cache"""
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch_tracking_changes,
+            name="mongodb-tracking-watch",
+            daemon=True
+        )
+        self._watch_thread.start()
+        logger.info("Watching MongoDB tracking changes")
+
+    def _watch_tracking_changes(self):
+        """
+        Apply tracking document inserts/updates to the cache until close() is called
+
+        Only UUIDs that are already cached (i.e. being polled) are refreshed. A failed stream is
+        reopened after the last seen event, so no change is skipped across reconnects.
+        """
+        resume_token = None
+        while not self._watch_stop.is_set():
+            try:
+                with self.collection.watch(
+                        TRACKING_WATCH_PIPELINE,
+                        full_document="updateLookup",
+                        resume_after=resume_token,
+                        max_await_time_ms=TRACKING_WATCH_MAX_AWAIT_MS
+                ) as stream:
+                    while stream.alive and not self._watch_stop.is_set():
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is None:
+                            continue
+
+                        document = change.get("fullDocument")
+                        if document and document.get("uuid"):
+                            self._set_cached_tracking_data(
+                                document["uuid"],
+                                _process_tracking_document(document),
+                                only_if_cached=True
+                            )
+            except PyMongoError as e:
+                if self._watch_stop.is_set():
+                    break
+                logger.error(f"MongoDB tracking change stream failed, reopening: {e}")
+                self._watch_stop.wait(TRACKING_WATCH_RETRY_SECONDS)
+
     def close(self):
         """Close MongoDB connection"""
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=TRACKING_WATCH_MAX_AWAIT_MS / 1000 + 1)
+            self._watch_thread = None
         if self.client:
             self.client.close()
             logger.info("MongoDB connection closed")
@@ -1,26 +1,47 @@
 import asyncio
+import contextlib
 import logging
+import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
-from enum import Enum
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional, List, Set, Tuple
+from enum import IntEnum
 
 logger = logging.getLogger(__name__)
 
+PROGRESS_RETENTION_SECONDS = 3600  # Keep finished upload records for an hour
+WAIT_LOG_INTERVAL_SECONDS = 5  # How often wait_for_uploads logs that it is still waiting
 
-class UploadStatus(str, Enum):
-    """Upload status enumeration"""
-    PENDING = "pending"
-    READING = "reading"
-    ENCODING = "encoding"
-    UPLOADING = "uploading"
-    COMPLETED = "completed"
-    FAILED = "failed"
+
+class UploadStatus(IntEnum):
+    """Upload status enumeration (ints internally; the API reports the names from STATUS_NAMES)"""
+    PENDING = 0
+    READING = 1
+    ENCODING = 2
+    UPLOADING = 3
+    COMPLETED = 4
+    FAILED = 5
+
+
+# API string for each status, indexed by its value ("pending", "reading", ...)
+STATUS_NAMES = tuple(status.name.lower() for status in UploadStatus)
+
+
+# Statuses after which an upload no longer counts as pending for its draft
+TERMINAL_STATUSES = frozenset({UploadStatus.COMPLETED, UploadStatus.FAILED})
 
 
 class UploadProgress:
     """Represents upload progress for a single file"""
     
+    __slots__ = (
+        "upload_id", "filename", "total_size", "bytes_read", "status",
+        "error_message", "created_at", "completed_at", "created_at_iso",
+        "completed_at_iso", "completed_monotonic", "upload_url", "draft_id", "progress_percent",
+        "_cached_dict",
+    )
+    
     def __init__(self, upload_id: str, filename: str, total_size: int):
         self.upload_id = upload_id
         self.filename = filename
@@ -30,71 +51,150 @@ class UploadProgress:
         self.error_message: Optional[str] = None
         self.created_at = datetime.now()
         self.completed_at: Optional[datetime] = None
+        self.created_at_iso = self.created_at.isoformat()
+        self.completed_at_iso: Optional[str] = None
+        self.completed_monotonic: Optional[float] = None  # Clock used for expiry
         self.upload_url: Optional[str] = None  # Microsoft Graph upload session URL
         self.draft_id: Optional[str] = None  # Draft ID for this upload
+        self.progress_percent: float = 0.0  # Kept in sync by update_progress
+        self._cached_dict: Optional[Dict] = None  # to_dict result; reset by invalidate()
     
-    def to_dict(self) -> Dict:
-        """Convert progress to dictionary"""
-        progress_percent = (
-            (self.bytes_read / self.total_size * 100) if self.total_size > 0 else 0
+    def refresh_percent(self):
+        """Recompute progress_percent after bytes_read or total_size changes"""
+        self.progress_percent = (
+            round(self.bytes_read / self.total_size * 100, 2) if self.total_size > 0 else 0.0
         )
-        
+    
+    def mark_completed(self):
+        """Stamp completion time and cache its ISO string for to_dict"""
+        self.completed_at = datetime.now()
+        self.completed_at_iso = self.completed_at.isoformat()
+        self.completed_monotonic = time.monotonic()
+    
+    def clear_completed(self):
+        """Drop the completion stamps when the upload leaves a terminal status (e.g. a retried chunk)"""
+        self.completed_at = None
+        self.completed_at_iso = None
+        self.completed_monotonic = None
+    
+    def invalidate(self):
+        """Drop the cached to_dict result; call before changing any field"""
+        self._cached_dict = None
+    
+    def to_dict(self) -> Dict:
+        """Convert progress to dictionary (reused until the upload changes; do not mutate it)"""
+        if self._cached_dict is None:
+            self._cached_dict = self._build_dict()
+        return self._cached_dict
+    
+    def _build_dict(self) -> Dict:
+        """Build the dictionary cached by to_dict"""
         return {
             "upload_id": self.upload_id,
             "filename": self.filename,
-            "status": self.status.value,
+            "status": STATUS_NAMES[self.status],
             "bytes_read": self.bytes_read,
             "total_size": self.total_size,
-            "progress_percent": round(progress_percent, 2),
+            "progress_percent": self.progress_percent,
             "error_message": self.error_message,
-            "created_at": self.created_at.isoformat(),
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+            "created_at": self.created_at_iso,
+            "completed_at": self.completed_at_iso
         }
 
 
 class UploadProgressService:
     """Service for tracking file upload progress"""
     
-    def __init__(self, cleanup_interval_seconds: int = 300):
+    def __init__(self, cleanup_interval_seconds: int = 300, max_records: int = 50000):
         """
-        Initialize upload progress service
+        Initialize upload progress service and start its cleanup task
+        
+        Must be called with an event loop running (the app creates it in its startup hook).
         
         Args:
-            cleanup_interval_seconds: Interval in seconds to clean up old progress records
+            cleanup_interval_seconds: Minimum gap in seconds between cleanup passes, so records
+                expiring close together are removed in one pass
+            max_records: Number of progress records above which the longest-finished ones are
+                evicted before their hour is up (in-flight uploads are never evicted)
         """
         self.progress: Dict[str, UploadProgress] = {}
-        self.draft_uploads: Dict[str, List[str]] = {}  # Map draft_id to list of upload_ids
+        # Map draft_id to its tracked upload_ids; a draft's entries here and in draft_events go
+        # away together once its last upload record is deleted or expires
+        self.draft_uploads: Dict[str, Set[str]] = {}
+        self.draft_events: Dict[str, asyncio.Event] = {}  # Set when one of a draft's uploads may have finished
+        self.draft_pending_count: Dict[str, int] = {}  # Drafts with unfinished uploads -> how many
+        # (completed_monotonic, upload_id) in completion order; monotonic stamps keep it sorted
+        self._expiry_queue: Deque[Tuple[float, str]] = deque()
+        self._expiry_scheduled = asyncio.Event()  # Set when an entry is appended to the expiry queue
         self.cleanup_interval = cleanup_interval_seconds
+        self.max_records = max_records
         self._cleanup_task: Optional[asyncio.Task] = None
-        self._start_cleanup_task()
+        self.start()
     
-    def _start_cleanup_task(self):
-        """Start background task to clean up old progress records"""
-        async def cleanup_loop():
-            while True:
-                await asyncio.sleep(self.cleanup_interval)
-                self._cleanup_old_progress()
-        
-        try:
-            loop = asyncio.get_event_loop()
-            self._cleanup_task = loop.create_task(cleanup_loop())
-        except RuntimeError:
-            # Event loop not running, cleanup will happen on next access
-            pass
+    def start(self):
+        """Start the background cleanup task on the running event loop, unless it is already running"""
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.get_running_loop().create_task(self._cleanup_loop())
+    
+    async def close(self):
+        """Stop the background cleanup task"""
+        task, self._cleanup_task = self._cleanup_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    
+    async def _cleanup_loop(self):
+        """Remove expired progress records as they come due; runs until cancelled by close()"""
+        while True:
+            if not self._expiry_queue:
+                # Nothing can expire until an upload finishes
+                self._expiry_scheduled.clear()
+                await self._expiry_scheduled.wait()
+                continue
+            # Sleep until the oldest finished record expires, but never pass more often than cleanup_interval
+            delay = self._expiry_queue[0][0] + PROGRESS_RETENTION_SECONDS - time.monotonic()
+            await asyncio.sleep(max(delay, self.cleanup_interval))
+            self._cleanup_old_progress()
     
     def _cleanup_old_progress(self):
         """Remove progress records older than 1 hour"""
-        cutoff_time = datetime.now() - timedelta(hours=1)
-        upload_ids_to_remove = [
-            upload_id for upload_id, progress in self.progress.items()
-            if progress.completed_at and progress.completed_at < cutoff_time
-        ]
+        cutoff_time = time.monotonic() - PROGRESS_RETENTION_SECONDS
+        queue = self._expiry_queue
+        removed = 0
         
-        for upload_id in upload_ids_to_remove:
+        while queue and queue[0][0] < cutoff_time:
+            _, upload_id = queue.popleft()
+            progress = self.progress.get(upload_id)
+            # Skip entries for deleted, resumed (no longer terminal) or later re-completed records
+            if (progress is None
+                    or progress.status not in TERMINAL_STATUSES
+                    or progress.completed_monotonic is None
+                    or progress.completed_monotonic >= cutoff_time):
+                continue
             del self.progress[upload_id]
+            self._forget_draft_upload(upload_id, progress.draft_id)
+            removed += 1
         
-        if upload_ids_to_remove:
-            logger.info(f"Cleaned up {len(upload_ids_to_remove)} old progress record(s)")
+        if removed:
+            logger.info(f"Cleaned up {removed} old progress record(s)")
+    
+    def _evict_finished_records(self):
+        """Remove the longest-finished records while there are more than max_records"""
+        queue = self._expiry_queue
+        while len(self.progress) > self.max_records and queue:
+            _, upload_id = queue.popleft()
+            progress = self.progress.get(upload_id)
+            if progress is None or progress.status not in TERMINAL_STATUSES:
+                continue
+            del self.progress[upload_id]
+            self._forget_draft_upload(upload_id, progress.draft_id)
+            logger.debug(f"Evicted progress record {upload_id} (over {self.max_records} records)")
+    
+    def _schedule_expiry(self, upload_id: str, progress: UploadProgress):
+        """Queue a finished upload for removal PROGRESS_RETENTION_SECONDS after it completed"""
+        self._expiry_queue.append((progress.completed_monotonic, upload_id))
+        self._expiry_scheduled.set()
     
     def create_progress(self, filename: str, total_size: int, draft_id: Optional[str] = None) -> str:
         """
@@ -116,12 +216,56 @@ class UploadProgressService:
         # Track upload by draft_id if provided
         if draft_id:
             if draft_id not in self.draft_uploads:
-                self.draft_uploads[draft_id] = []
-            self.draft_uploads[draft_id].append(upload_id)
+                self.draft_uploads[draft_id] = set()
+                self.draft_events[draft_id] = asyncio.Event()
+            self.draft_uploads[draft_id].add(upload_id)
+            self._adjust_pending_count(draft_id, 1)
+        
+        if len(self.progress) > self.max_records:
+            self._evict_finished_records()
         
         logger.info(f"Created progress tracker: {upload_id} for {filename} ({total_size} bytes)")
         return upload_id
     
+    def _adjust_pending_count(self, draft_id: Optional[str], delta: int):
+        """Add delta to a draft's unfinished upload count, dropping drafts that reach zero"""
+        if not draft_id:
+            return
+        count = self.draft_pending_count.get(draft_id, 0) + delta
+        if count > 0:
+            self.draft_pending_count[draft_id] = count
+        else:
+            self.draft_pending_count.pop(draft_id, None)
+    
+    def _track_status_change(self, progress: UploadProgress, old_status: UploadStatus):
+        """Update draft_pending_count when an upload enters or leaves a terminal status"""
+        was_pending = old_status not in TERMINAL_STATUSES
+        is_pending = progress.status not in TERMINAL_STATUSES
+        if was_pending != is_pending:
+            self._adjust_pending_count(progress.draft_id, 1 if is_pending else -1)
+    
+    def _forget_draft_upload(self, upload_id: str, draft_id: Optional[str]):
+        """Drop a removed upload from its draft, and the draft itself once it has no uploads left"""
+        upload_ids = self.draft_uploads.get(draft_id) if draft_id else None
+        if upload_ids is None:
+            return
+        upload_ids.discard(upload_id)
+        if not upload_ids:
+            del self.draft_uploads[draft_id]
+            self.draft_events.pop(draft_id, None)
+    
+    def _notify_draft_if_finished(self, draft_id: Optional[str]):
+        """Wake a draft's waiters once its last pending upload is done, not on every completion"""
+        if not self.draft_pending_count.get(draft_id):
+            self._notify_draft(draft_id)
+    
+    def _notify_draft(self, draft_id: Optional[str]):
+        """Wake wait_for_uploads callers for a draft so they re-check its uploads"""
+        if draft_id:
+            event = self.draft_events.get(draft_id)
+            if event is not None:
+                event.set()
+    
     def set_upload_url(self, upload_id: str, upload_url: str):
         """
         Store the Microsoft Graph upload session URL for an upload
@@ -130,8 +274,9 @@ class UploadProgressService:
             upload_id: Upload ID
             upload_url: Microsoft Graph upload session URL
         """
-        if upload_id in self.progress:
-            self.progress[upload_id].upload_url = upload_url
+        progress = self.progress.get(upload_id)
+        if progress is not None:
+            progress.upload_url = upload_url
             logger.debug(f"Set upload URL for {upload_id}")
     
     def get_upload_url(self, upload_id: str) -> Optional[str]:
@@ -144,9 +289,8 @@ class UploadProgressService:
         Returns:
             Upload URL or None if not found
         """
-        if upload_id in self.progress:
-            return self.progress[upload_id].upload_url
-        return None
+        progress = self.progress.get(upload_id)
+        return progress.upload_url if progress is not None else None
     
     def get_pending_uploads_for_draft(self, draft_id: str) -> List[str]:
         """
@@ -158,15 +302,39 @@ class UploadProgressService:
         Returns:
             List of upload IDs that are not yet completed
         """
-        if draft_id not in self.draft_uploads:
+        upload_ids = self.draft_uploads.get(draft_id)
+        if not upload_ids:
             return []
         
         pending = []
-        for upload_id in self.draft_uploads.get(draft_id, []):
-            if upload_id in self.progress:
-                progress = self.progress[upload_id]
-                if progress.status not in [UploadStatus.COMPLETED, UploadStatus.FAILED]:
-                    pending.append(upload_id)
+        for upload_id in upload_ids:
+            progress = self.progress.get(upload_id)
+            if progress is not None and progress.status not in TERMINAL_STATUSES:
+                pending.append(upload_id)
+        
+        return pending
+    
+    def _scan_draft(self, draft_id: str) -> List[str]:
+        """
+        Walk a draft's uploads once, auto-completing any whose bytes have all arrived
+        
+        Args:
+            draft_id: Draft ID
+            
+        Returns:
+            Upload IDs that are still pending afterwards
+        """
+        pending = []
+        for upload_id in self.draft_uploads.get(draft_id, ()):
+            progress = self.progress.get(upload_id)
+            if progress is None or progress.status in TERMINAL_STATUSES:
+                continue
+            # Auto-complete if bytes_read equals total_size (even if status isn't COMPLETED)
+            if progress.bytes_read >= progress.total_size and progress.total_size > 0:
+                logger.info(f"Auto-completing upload {upload_id} - all bytes uploaded ({progress.bytes_read}/{progress.total_size})")
+                self.update_progress(upload_id, status=UploadStatus.COMPLETED)
+            else:
+                pending.append(upload_id)
         
         return pending
     
@@ -181,33 +349,30 @@ class UploadProgressService:
         Returns:
             True if all uploads completed, False if timeout
         """
-        import time
-        start_time = time.time()
-        check_count = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
         
-        while time.time() - start_time < timeout:
-            pending = self.get_pending_uploads_for_draft(draft_id)
-            if not pending:
+        while True:
+            if not self.draft_pending_count.get(draft_id):
                 logger.info(f"All uploads completed for draft {draft_id}")
                 return True
             
-            # Check if any failed
-            for upload_id in pending:
-                if upload_id in self.progress:
-                    progress = self.progress[upload_id]
-                    if progress.status == UploadStatus.FAILED:
-                        logger.warning(f"Upload {upload_id} failed for draft {draft_id}")
-                        return False
-                    # Auto-complete if bytes_read equals total_size (even if status isn't COMPLETED)
-                    if progress.bytes_read >= progress.total_size and progress.total_size > 0:
-                        logger.info(f"Auto-completing upload {upload_id} - all bytes uploaded ({progress.bytes_read}/{progress.total_size})")
-                        self.update_progress(upload_id, status=UploadStatus.COMPLETED)
+            # A draft with pending uploads always has an event. Cleared before checking, so an update
+            # made by (or during) the checks below leaves it set and the wait returns at once
+            event = self.draft_events[draft_id]
+            event.clear()
             
-            check_count += 1
-            if check_count % 10 == 0:  # Log every 5 seconds (10 * 0.5s)
-                logger.info(f"Still waiting for {len(pending)} upload(s) for draft {draft_id}...")
+            pending = self._scan_draft(draft_id)
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
             
-            await asyncio.sleep(0.5)  # Check every 500ms
+            # Sleep until update_progress/set_error/delete_progress touches one of this draft's uploads
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, WAIT_LOG_INTERVAL_SECONDS))
+            except asyncio.TimeoutError:
+                logger.info(f"Still waiting for {len(pending)} upload(s) for draft {draft_id}...")
         
         # Timeout reached
         pending = self.get_pending_uploads_for_draft(draft_id)
@@ -230,11 +395,12 @@ class UploadProgressService:
             status: Current status
             total_size: Total size (can be updated if initially unknown)
         """
-        if upload_id not in self.progress:
+        progress = self.progress.get(upload_id)
+        if progress is None:
             logger.warning(f"Progress tracker not found: {upload_id}")
             return
         
-        progress = self.progress[upload_id]
+        progress.invalidate()
         
         if bytes_read is not None:
             progress.bytes_read = bytes_read
@@ -242,11 +408,25 @@ class UploadProgressService:
         if total_size is not None:
             progress.total_size = total_size
         
+        if bytes_read is not None or total_size is not None:
+            progress.refresh_percent()
+        
         if status is not None:
+            old_status = progress.status
             progress.status = status
+            self._track_status_change(progress, old_status)
         
-        if status == UploadStatus.COMPLETED or status == UploadStatus.FAILED:
-            progress.completed_at = datetime.now()
+        if status in TERMINAL_STATUSES:
+            progress.mark_completed()
+            self._schedule_expiry(upload_id, progress)
+            self._notify_draft_if_finished(progress.draft_id)
+        else:
+            if status is not None and progress.completed_monotonic is not None:
+                # Back in progress (e.g. a failed chunk was retried), so the record must not expire
+                progress.clear_completed()
+            if bytes_read is not None and 0 < progress.total_size <= progress.bytes_read:
+                # Waiters auto-complete uploads whose bytes have all arrived
+                self._notify_draft(progress.draft_id)
     
     def set_error(self, upload_id: str, error_message: str):
         """
@@ -256,14 +436,19 @@ class UploadProgressService:
             upload_id: Upload ID
             error_message: Error message
         """
-        if upload_id not in self.progress:
+        progress = self.progress.get(upload_id)
+        if progress is None:
             logger.warning(f"Progress tracker not found: {upload_id}")
             return
         
-        progress = self.progress[upload_id]
+        progress.invalidate()
+        old_status = progress.status
         progress.status = UploadStatus.FAILED
+        self._track_status_change(progress, old_status)
         progress.error_message = error_message
-        progress.completed_at = datetime.now()
+        progress.mark_completed()
+        self._schedule_expiry(upload_id, progress)
+        self._notify_draft_if_finished(progress.draft_id)
     
     def get_progress(self, upload_id: str) -> Optional[Dict]:
         """
@@ -275,10 +460,8 @@ class UploadProgressService:
         Returns:
             Progress dictionary or None if not found
         """
-        if upload_id not in self.progress:
-            return None
-        
-        return self.progress[upload_id].to_dict()
+        progress = self.progress.get(upload_id)
+        return progress.to_dict() if progress is not None else None
     
     def delete_progress(self, upload_id: str):
         """
@@ -287,11 +470,11 @@ class UploadProgressService:
         Args:
             upload_id: Upload ID
         """
-        if upload_id in self.progress:
-            del self.progress[upload_id]
+        progress = self.progress.pop(upload_id, None)
+        if progress is not None:
+            if progress.status not in TERMINAL_STATUSES:
+                self._adjust_pending_count(progress.draft_id, -1)
+            self._notify_draft_if_finished(progress.draft_id)
+            self._forget_draft_upload(upload_id, progress.draft_id)
             logger.info(f"Deleted progress tracker: {upload_id}")
 
-
-# Global upload progress service instance
-upload_progress_service = UploadProgressService()
-
@@ -11,5 +11,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,
         reload=settings.debug,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )